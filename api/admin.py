@@ -1,3 +1,40 @@
-from django.contrib import admin
+import json
 
-# Register your models here.
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+
+from api.profiling import list_reports, read_report
+
+
+@staff_member_required
+def profile_report_list(request):
+    links = format_html_join(
+        "\n",
+        '<li><a href="{}">{}</a></li>',
+        (
+            (reverse("profile_report_detail", args=(report_id,)), report_id)
+            for report_id in list_reports()
+        ),
+    )
+    return HttpResponse(
+        format_html("<h1>Profiling reports</h1>\n<ul>\n{}\n</ul>", links)
+    )
+
+
+@staff_member_required
+def profile_report_detail(request, report_id):
+    try:
+        report = read_report(report_id)
+    except FileNotFoundError:
+        raise Http404("No such report.")
+    profile = report.pop("profile")
+    queries = report.pop("queries")
+    lines = [json.dumps(report, indent=2), "", "SQL queries:"]
+    for query in sorted(queries, key=lambda q: q["duration_ms"], reverse=True):
+        lines.append(f"{query['duration_ms']:.2f} ms [{query['alias']}] {query['sql']}")
+        if "explain" in query:
+            lines.append("    " + query["explain"].replace("\n", "\n    "))
+    lines += ["", profile]
+    return HttpResponse("\n".join(lines), content_type="text/plain; charset=utf-8")
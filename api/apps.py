@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = "api"
+
+    def ready(self):
+        from api import signals  # noqa: F401
+        from api.throttling import check_throttle_rates
+
+        # fail on start instead of on the first throttled request
+        check_throttle_rates()
@@ -0,0 +1,97 @@
+import datetime
+import json
+import zlib
+from decimal import Decimal
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from api.models import BudgetEntry, BudgetEntryArchive
+
+COLUMNS = ("id", "name", "type", "value", "created_at")
+# below the limit of query parameters of every supported database
+DELETE_BATCH_SIZE = 900
+
+
+def pack(columns):
+    data = json.dumps(columns, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return zlib.compress(data.encode())
+
+
+def unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def archive_entries(before, budgets=None):
+    """
+    Move entries created before ``before`` into one BudgetEntryArchive row
+    per budget and month, for the ``budgets`` queryset or all budgets.
+    Returns the number of archived entries.
+    """
+    entries = BudgetEntry.objects.filter(created_at__lt=before)
+    if budgets is not None:
+        entries = entries.filter(budget__in=budgets)
+    budget_ids = list(entries.order_by().values_list("budget_id", flat=True).distinct())
+    archived = 0
+    for budget_id in budget_ids:
+        with transaction.atomic():
+            archived += _archive_budget(entries.filter(budget_id=budget_id), budget_id)
+    return archived
+
+
+def _archive_budget(entries, budget_id):
+    # locked until the entries are deleted, so an entry edited meanwhile is
+    # not archived with its old values
+    rows = list(
+        entries.select_for_update().order_by("created_at", "pk").values_list(*COLUMNS)
+    )
+    existing = {
+        archive.month: archive
+        for archive in BudgetEntryArchive.objects.select_for_update().filter(
+            budget_id=budget_id
+        )
+    }
+    archived = 0
+    for month, group in groupby(
+        rows, key=lambda row: datetime.date(row[4].year, row[4].month, 1)
+    ):
+        archive = existing.get(month) or BudgetEntryArchive(
+            budget_id=budget_id, month=month
+        )
+        columns = unpack(archive.data) if archive.pk else {c: [] for c in COLUMNS}
+        for row in group:
+            for column, value in zip(COLUMNS, row):
+                columns[column].append(value)
+            archived += 1
+        archive.data = pack(columns)
+        archive.save()
+    # only the entries read above, an entry moved into the budget meanwhile
+    # matches the filter too; nothing references entries and they have no
+    # delete receivers (see api.models.entry_deleted), so this is a DELETE
+    # query per batch
+    pks = [row[0] for row in rows]
+    for start in range(0, len(pks), DELETE_BATCH_SIZE):
+        BudgetEntry.objects.filter(
+            pk__in=pks[start : start + DELETE_BATCH_SIZE]
+        ).delete()
+    return archived
+
+
+def archived_entries(archives):
+    """
+    Return the entries stored in ``archives`` as unsaved BudgetEntry
+    instances, so they can be serialized like live entries.
+    """
+    entries = []
+    for archive in archives.order_by("budget_id", "month"):
+        columns = unpack(archive.data)
+        for values in zip(*(columns[column] for column in COLUMNS)):
+            entry = BudgetEntry(
+                budget_id=archive.budget_id, **dict(zip(COLUMNS, values))
+            )
+            entry.value = Decimal(entry.value)
+            entry.created_at = parse_datetime(entry.created_at)
+            entries.append(entry)
+    return entries
@@ -0,0 +1,232 @@
+import functools
+import itertools
+import json
+import queue
+import threading
+import uuid
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+
+RESET = "reset"
+
+
+class Event:
+    def __init__(self, id, name, data):
+        self.id = id
+        self.name = name
+        self.data = data
+
+    def encode(self):
+        data = json.dumps(self.data, cls=DjangoJSONEncoder)
+        if self.id is None:
+            return f"event: {self.name}\ndata: {data}\n\n"
+        return f"id: {self.id}\nevent: {self.name}\ndata: {data}\n\n"
+
+
+def parse_event_id(event_id):
+    """
+    Split an event id of the form "<epoch>-<sequence>" into (epoch, sequence),
+    None if it is malformed.
+    """
+    epoch, _, sequence = str(event_id).rpartition("-")
+    if not epoch or not sequence.isdigit():
+        return None
+    return epoch, int(sequence)
+
+
+class LocalBackend:
+    """
+    Delivers published events to the listeners of the current process only.
+
+    A cross-process backend (e.g. built on a message broker) has to provide
+    the same two methods: ``publish`` sends the event to every process and
+    ``subscribe`` registers a listener called with (user_id, event) for each
+    event. Event ids are "<epoch>-<sequence>", where the sequence increases
+    with every event and a new epoch starts whenever the sequence starts
+    over, e.g. when the process restarts, so ids from before are never
+    mistaken for current ones.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.epoch = uuid.uuid4().hex[:12]
+        self.counter = itertools.count(1)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def publish(self, user_id, name, data):
+        with self.lock:
+            sequence = next(self.counter)
+            event = Event(f"{self.epoch}-{sequence}", name, data)
+            for listener in self.listeners:
+                listener(user_id, event)
+
+
+class Subscription:
+    def __init__(self, user_id, queue_size, backlog=()):
+        self.user_id = user_id
+        # replayed events are not limited by the queue size
+        self.backlog = deque(backlog)
+        self.queue = queue.Queue(queue_size)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # never block the publishing request on a slow client, make it
+            # reconnect and resume from its last event instead
+            self.overflowed = True
+            self.queue = queue.Queue()
+            self.queue.put(Event(None, RESET, {}))
+
+    def get(self, timeout):
+        if self.backlog:
+            return self.backlog.popleft()
+        return self.queue.get(timeout=timeout)
+
+
+class History:
+    """
+    The last events of a user, together with the id of an event from before
+    them, ``since``, such that every event of the user after it is kept.
+    """
+
+    def __init__(self, size, since):
+        self.events = deque(maxlen=size)
+        self.since = since
+
+    def append(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.since = parse_event_id(self.events[0].id)
+        self.events.append(event)
+
+
+class EventHub:
+    """
+    Fans out events of each user to that user's open streams and keeps the
+    last ``history`` events of the ``users`` users with the most recent
+    events, so a reconnecting client can resume from the id it has seen last.
+    """
+
+    def __init__(self, backend, history=1000, queue_size=100, users=1000):
+        self.backend = backend
+        self.history_size = history
+        self.queue_size = queue_size
+        self.users = users
+        self.lock = threading.Lock()
+        # (epoch, sequence) of the last event dispatched
+        self.last = None
+        self.history = OrderedDict()
+        self.subscriptions = {}
+        backend.subscribe(self.dispatch)
+
+    def publish(self, user_id, name, data):
+        self.backend.publish(user_id, name, data)
+
+    def dispatch(self, user_id, event):
+        epoch, sequence = parse_event_id(event.id)
+        with self.lock:
+            history = self.history.get(user_id)
+            if history is None or history.since[0] != epoch:
+                # the hub has seen every event after the last one, none of
+                # them was the user's
+                since = self.last
+                if since is None or since[0] != epoch:
+                    since = (epoch, sequence - 1)
+                history = self.history[user_id] = History(self.history_size, since)
+            history.append(event)
+            self.history.move_to_end(user_id)
+            if len(self.history) > self.users:
+                # forget the user whose last event is the oldest
+                self.history.popitem(last=False)
+            self.last = (epoch, sequence)
+            for subscription in self.subscriptions.get(user_id, ()):
+                subscription.put(event)
+
+    def subscribe(self, user_id, last_event_id=None):
+        with self.lock:
+            backlog = []
+            if last_event_id is not None:
+                resumed = self.resume(self.history.get(user_id), last_event_id)
+                if resumed is None:
+                    # events after last_event_id are not available, they are
+                    # too old or were published before a restart
+                    backlog.append(Event(None, RESET, {}))
+                else:
+                    backlog.extend(resumed)
+            subscription = Subscription(user_id, self.queue_size, backlog)
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def resume(self, history, last_event_id):
+        """
+        Return the events of ``history`` after ``last_event_id``, None if
+        some of them may be missing.
+        """
+        last = parse_event_id(last_event_id)
+        if history is None or last is None:
+            return None
+        # the history of the user has to go back to last_event_id, which can
+        # not be newer than the last event of the current epoch
+        epoch, sequence = self.last
+        if history.since[0] != epoch or last[0] != epoch:
+            return None
+        if not history.since[1] <= last[1] <= sequence:
+            return None
+        return [
+            event for event in history.events if parse_event_id(event.id)[1] > last[1]
+        ]
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.user_id, None)
+
+
+@functools.lru_cache(maxsize=None)
+def get_hub():
+    return EventHub(
+        import_string(settings.API_EVENTS_BACKEND)(),
+        history=settings.API_EVENTS_HISTORY,
+        queue_size=settings.API_EVENTS_QUEUE_SIZE,
+        users=settings.API_EVENTS_USERS,
+    )
+
+
+def stream(hub, user_id, last_event_id, heartbeat):
+    # subscribes on the first iteration only, so a response closed before it,
+    # e.g. of a HEAD request, leaves no subscription behind
+    subscription = hub.subscribe(user_id, last_event_id)
+    try:
+        yield f"retry: {settings.API_EVENTS_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = subscription.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield event.encode()
+            if event.name == RESET:
+                return
+    finally:
+        hub.unsubscribe(subscription)
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # only errors are rendered, events are streamed by the view
+        return Event(None, "error", data).encode()
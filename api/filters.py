@@ -1,6 +1,8 @@
 import django_filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 
-from api.models import Budget
+from api.models import Budget, BudgetEntry
 
 
 class CategoryFilter(django_filters.FilterSet):
@@ -11,3 +13,63 @@ class CategoryFilter(django_filters.FilterSet):
     class Meta:
         model = Budget
         fields = ("category",)
+
+
+class BudgetEntryFilter(django_filters.FilterSet):
+    budget = django_filters.NumberFilter(field_name="budget_id")
+    value_min = django_filters.NumberFilter(field_name="value", lookup_expr="gte")
+    value_max = django_filters.NumberFilter(field_name="value", lookup_expr="lte")
+    created_after = django_filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="gte"
+    )
+    created_before = django_filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="lt"
+    )
+    search = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
+
+    class Meta:
+        model = BudgetEntry
+        fields = ("budget", "type")
+
+
+class KeysetOrderingFilter(OrderingFilter):
+    """
+    Ordering that an index can serve without sorting, by a single field with
+    the primary key as tie-breaker. Rows matching a range filter come out of
+    an index in the order of the filtered field only, so filters listed in
+    the view's ``range_filter_orderings`` (filter name to field) order by
+    that field by default and reject other orderings, as well as range
+    filters on another field.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        explicit = request.query_params.get(self.ordering_param)
+        if explicit and len(explicit.split(",")) > 1:
+            raise ValidationError(
+                {self.ordering_param: "Only a single field can be ordered by."}
+            )
+        ranges = {
+            param: field
+            for param, field in getattr(view, "range_filter_orderings", {}).items()
+            if request.query_params.get(param) not in (None, "")
+        }
+        if len(set(ranges.values())) > 1:
+            raise ValidationError(
+                f"{', '.join(ranges)} can not be combined, they filter "
+                "different fields."
+            )
+        for param, field in ranges.items():
+            if ordering[0].lstrip("-") == field:
+                continue
+            if explicit:
+                raise ValidationError(
+                    {
+                        self.ordering_param: f"Has to be {field} or -{field} "
+                        f"when filtering by {param}."
+                    }
+                )
+            ordering = (field,)
+        # break ties on the primary key in the same direction, so the index
+        # serving the ordering also serves the tie-breaker
+        return (*ordering, "-id" if ordering[-1].startswith("-") else "id")
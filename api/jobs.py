@@ -0,0 +1,194 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from api.archive import archived_entries
+from api.models import Budget, BudgetEntry, BudgetEntryArchive, Category, Job
+from api.serializers import BudgetEntrySerializer
+from api.stats import compute_stats
+from api.stats_cache import bump_stats_version
+
+BATCH_SIZE = 1000
+MAX_REPORT_YEARS = 50
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def claim_jobs(limit, jobs=None):
+    """
+    Mark up to ``limit`` pending jobs (of the ``jobs`` queryset, all by
+    default) as running and return their ids. The conditional update makes
+    sure a job is picked up by one worker only.
+    """
+    jobs = Job.objects.all() if jobs is None else jobs
+    pending = jobs.filter(status=Job.Statuses.PENDING).order_by("created_at")
+    claimed = []
+    for pk in pending.values_list("pk", flat=True)[:limit]:
+        now = timezone.now()
+        if Job.objects.filter(pk=pk, status=Job.Statuses.PENDING).update(
+            status=Job.Statuses.RUNNING, started_at=now, heartbeat_at=now
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def reclaim_jobs(jobs=None):
+    """
+    Fail running jobs (of the ``jobs`` queryset, all by default) without a
+    heartbeat for settings.JOB_HEARTBEAT_TIMEOUT seconds, e.g. because the
+    run_jobs process running them was killed, and return their ids. They are
+    not retried as they may have been half done.
+    """
+    jobs = Job.objects.all() if jobs is None else jobs
+    deadline = timezone.now() - timedelta(seconds=settings.JOB_HEARTBEAT_TIMEOUT)
+    stale = jobs.filter(status=Job.Statuses.RUNNING, heartbeat_at__lt=deadline)
+    reclaimed = []
+    for pk in stale.values_list("pk", flat=True):
+        # the job may have reported progress since it was selected
+        if stale.filter(pk=pk).update(
+            status=Job.Statuses.FAILED,
+            error="The worker running the job stopped responding.",
+            finished_at=timezone.now(),
+        ):
+            reclaimed.append(pk)
+    return reclaimed
+
+
+def heartbeat(job_ids):
+    Job.objects.filter(pk__in=job_ids, status=Job.Statuses.RUNNING).update(
+        heartbeat_at=timezone.now()
+    )
+
+
+def run_job(job_id):
+    """
+    Run a claimed job and return whether it is done. The outcome is only
+    recorded while the job is still running, not once it has been reclaimed.
+    """
+    job = Job.objects.get(pk=job_id)
+    try:
+        result = HANDLERS[job.kind](job)
+    except Exception as exc:
+        fail_job(job_id, exc)
+        return False
+    return bool(
+        Job.objects.filter(pk=job_id, status=Job.Statuses.RUNNING).update(
+            status=Job.Statuses.DONE,
+            progress=100,
+            result=json.dumps(result, cls=DjangoJSONEncoder),
+            finished_at=timezone.now(),
+        )
+    )
+
+
+def run_pooled_job(job_id):
+    # pool workers outlive many jobs, drop connections the database has
+    # closed meanwhile the way Django does around every request
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def fail_job(job_id, exc):
+    Job.objects.filter(pk=job_id, status=Job.Statuses.RUNNING).update(
+        status=Job.Statuses.FAILED, error=str(exc), finished_at=timezone.now()
+    )
+
+
+def set_progress(job, done, total):
+    progress = min(int(done * 100 / total), 99) if total else 0
+    Job.objects.filter(pk=job.pk).update(progress=progress, heartbeat_at=timezone.now())
+
+
+@handler(Job.Kinds.EXPORT)
+def export_data(job):
+    categories = Category.objects.filter(user_id=job.user_id)
+    budgets = Budget.objects.filter(user_id=job.user_id)
+    entries = BudgetEntry.objects.filter(user_id=job.user_id)
+    total = entries.count()
+    result = {
+        "categories": list(categories.values("id", "name", "created_at")),
+        "budgets": list(budgets.values("id", "name", "category_id", "created_at")),
+        "entries": [],
+    }
+    rows = entries.order_by("pk").values(
+        "id", "name", "type", "value", "budget_id", "created_at"
+    )
+    for i, row in enumerate(rows.iterator(chunk_size=BATCH_SIZE), 1):
+        result["entries"].append(row)
+        if i % BATCH_SIZE == 0:
+            set_progress(job, i, total)
+    archives = BudgetEntryArchive.objects.filter(budget__user_id=job.user_id)
+    for entry in archived_entries(archives):
+        result["entries"].append(
+            {
+                "id": entry.pk,
+                "name": entry.name,
+                "type": entry.type,
+                "value": entry.value,
+                "budget_id": entry.budget_id,
+                "created_at": entry.created_at,
+            }
+        )
+    return result
+
+
+@handler(Job.Kinds.IMPORT)
+def import_entries(job):
+    budget = Budget.objects.get(pk=job.params["budget"], user_id=job.user_id)
+    rows = job.params.get("entries", [])
+    entries = []
+    errors = {}
+    for i, row in enumerate(rows, 1):
+        serializer = BudgetEntrySerializer(data={**row, "budget": budget.pk})
+        if serializer.is_valid():
+            entries.append(
+                BudgetEntry(**serializer.validated_data, user_id=budget.user_id)
+            )
+        else:
+            errors[i - 1] = serializer.errors
+        # validation takes most of the time, progress written inside the
+        # transaction below would not be visible until the import is done
+        if i % BATCH_SIZE == 0:
+            set_progress(job, i, len(rows))
+    with transaction.atomic():
+        BudgetEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+    # bulk_create does not send post_save, see api.signals
+    bump_stats_version(Budget.objects.filter(pk=budget.pk))
+    return {"created": len(entries), "errors": errors}
+
+
+@handler(Job.Kinds.REPORT)
+def yearly_report(job):
+    current_year = timezone.now().year
+    year_from = int(job.params.get("year_from", current_year))
+    year_to = int(job.params.get("year_to", current_year))
+    if year_from > year_to:
+        raise ValueError("year_from must not be greater than year_to.")
+    if year_to - year_from >= MAX_REPORT_YEARS:
+        raise ValueError(f"A report can span at most {MAX_REPORT_YEARS} years.")
+    entries = BudgetEntry.objects.filter(user_id=job.user_id)
+    archives = BudgetEntryArchive.objects.filter(budget__user_id=job.user_id)
+    years = range(year_from, year_to + 1)
+    result = {}
+    for i, year in enumerate(years):
+        result[year] = compute_stats(
+            entries.filter(created_at__year=year),
+            archives.filter(month__year=year),
+        )
+        set_progress(job, i + 1, len(years))
+    return result
@@ -0,0 +1,37 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.archive import archive_entries
+from api.models import Budget
+
+
+class Command(BaseCommand):
+    help = "Move old budget entries into the compressed monthly archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ENTRY_ARCHIVE_AFTER_DAYS,
+            help="Archive entries created more than this many days ago.",
+        )
+        parser.add_argument(
+            "--budget",
+            type=int,
+            action="append",
+            dest="budgets",
+            help="Only archive entries of the budget with this id, can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - datetime.timedelta(days=options["days"])
+        budgets = None
+        if options["budgets"]:
+            budgets = Budget.objects.filter(pk__in=options["budgets"])
+        archived = archive_entries(before, budgets)
+        self.stdout.write(
+            f"Archived {archived} entries created before {before:%Y-%m-%d}."
+        )
@@ -0,0 +1,81 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+if sys.argv[2] == "1":
+    from tivix.warmup import warm_up
+    warm_up()
+ready = time.perf_counter()
+from django.test import Client
+client = Client()
+client.get(sys.argv[1])
+first = time.perf_counter()
+client.get(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    "setup": ready - start,
+    "first_request": first - ready,
+    "second_request": second - first,
+    "first_response": first - start,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark time-to-first-response of fresh processes for the full and "
+        "the API-only settings, with and without warm-up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/budget/")
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--settings-modules",
+            nargs="+",
+            default=["tivix.settings", "tivix.settings_api"],
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'settings':<20} {'warm-up':<8} {'setup':>9} {'1st req':>9} "
+            f"{'2nd req':>9} {'1st response':>13}   (median of {options['runs']} "
+            f"runs, ms)"
+        )
+        for settings_module in options["settings_modules"]:
+            for warmup in (False, True):
+                results = [
+                    self.run_once(settings_module, options["path"], warmup)
+                    for i in range(options["runs"])
+                ]
+                median = {
+                    key: statistics.median(r[key] for r in results) * 1000
+                    for key in results[0]
+                }
+                self.stdout.write(
+                    f"{settings_module:<20} {'yes' if warmup else 'no':<8} "
+                    f"{median['setup']:>9.1f} {median['first_request']:>9.1f} "
+                    f"{median['second_request']:>9.1f} "
+                    f"{median['first_response']:>13.1f}"
+                )
+
+    def run_once(self, settings_module, path, warmup):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+        env.pop("DJANGO_WARMUP", None)
+        process = subprocess.run(
+            [sys.executable, "-c", SCRIPT, path, "1" if warmup else "0"],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return json.loads(process.stdout.splitlines()[-1])
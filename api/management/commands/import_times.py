@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCRIPT = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the modules imported while a fresh process sets Django up and "
+        "loads the URL configuration, using python -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--settings-module",
+            default=settings.SETTINGS_MODULE,
+            help="Settings module to measure, defaults to the current one.",
+        )
+        parser.add_argument("--limit", type=int, default=25)
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": options["settings_module"]}
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            self.stderr.write(process.stderr)
+            return
+        modules = parse_importtime(process.stderr)
+        total = sum(self_us for self_us, _ in modules.values())
+        self.stdout.write(
+            f"{options['settings_module']}: {len(modules)} modules imported "
+            f"in {total / 1000:.1f} ms"
+        )
+        self.stdout.write(f"{'self [ms]':>10} {'cumulative [ms]':>16}  module")
+        ranking = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (self_us, cumulative_us) in ranking[: options["limit"]]:
+            self.stdout.write(
+                f"{self_us / 1000:>10.1f} {cumulative_us / 1000:>16.1f}  {name}"
+            )
+
+
+def parse_importtime(output):
+    """
+    Parse ``python -X importtime`` output into
+    {module: (self time in us, cumulative time in us)}.
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # the header line
+            continue
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
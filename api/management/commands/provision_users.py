@@ -0,0 +1,30 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users in bulk from a JSON file holding a list of objects with "
+        "username, password1 and password2."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='JSON file to read, "-" for stdin.')
+        parser.add_argument("--workers", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["path"] == "-":
+            rows = json.load(sys.stdin)
+        else:
+            with open(options["path"]) as f:
+                rows = json.load(f)
+        if not isinstance(rows, list):
+            raise CommandError("Expected a list of users.")
+        created, errors = provision_users(rows, options["workers"])
+        for index, row_errors in errors.items():
+            self.stderr.write(f"Row {index}: {json.dumps(row_errors)}")
+        self.stdout.write(f"Created {len(created)} users, {len(errors)} rows failed.")
@@ -0,0 +1,61 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import claim_jobs, fail_job, heartbeat, reclaim_jobs, run_pooled_job
+from api.models import Job
+from api.utils import process_pool
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between checks for new jobs.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once there are no pending or running jobs left.",
+        )
+        parser.add_argument(
+            "--job",
+            type=int,
+            action="append",
+            dest="jobs",
+            help="Only run the job with this id, can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        jobs = Job.objects.all()
+        if options["jobs"]:
+            jobs = jobs.filter(pk__in=options["jobs"])
+        running = {}
+        with process_pool(workers) as pool:
+            while True:
+                for future in [f for f in running if f.done()]:
+                    job_id = running.pop(future)
+                    try:
+                        done = future.result()
+                    except Exception as exc:
+                        # the worker itself crashed, e.g. the job was deleted
+                        fail_job(job_id, exc)
+                        done = False
+                    self.stdout.write(f"Job {job_id} {'done' if done else 'failed'}.")
+                # handlers may go long without reporting progress, the jobs
+                # are alive as long as this process is
+                heartbeat(list(running.values()))
+                for job_id in reclaim_jobs(jobs):
+                    self.stdout.write(f"Job {job_id} failed, its worker stopped.")
+                for job_id in claim_jobs(workers - len(running), jobs):
+                    running[pool.submit(run_pooled_job, job_id)] = job_id
+                if options["once"] and not running:
+                    break
+                time.sleep(options["poll_interval"])
@@ -0,0 +1,66 @@
+import random
+import threading
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from api.profiling import profile_view
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Shed load instead of queueing it: once the process is serving
+    API_MAX_CONCURRENT_REQUESTS requests, further requests get an immediate
+    503 with a Retry-After header.
+    """
+
+    def __init__(self, get_response):
+        if not settings.API_MAX_CONCURRENT_REQUESTS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slots = threading.BoundedSemaphore(settings.API_MAX_CONCURRENT_REQUESTS)
+
+    def __call__(self, request):
+        if not self.slots.acquire(blocking=False):
+            response = JsonResponse(
+                {"detail": "Server is overloaded, try again later."}, status=503
+            )
+            response["Retry-After"] = str(settings.API_OVERLOAD_RETRY_AFTER)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
+
+
+class ProfilingMiddleware:
+    """
+    Profile views of staff users sending the API_PROFILING_HEADER header, and
+    a sample of the requests to the URL names in API_PROFILING_SAMPLE_RATES.
+    Reports are browsable at /admin/profiles/. Not loaded at all unless
+    API_PROFILING_ENABLED is set.
+
+    Needs to be placed after AuthenticationMiddleware. Only session
+    authentication is known here, so staff have to be logged in to trigger
+    profiling with the header.
+    """
+
+    def __init__(self, get_response):
+        if not settings.API_PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.should_profile(request):
+            return profile_view(request, view_func, view_args, view_kwargs)
+        return None
+
+    def should_profile(self, request):
+        if request.META.get(settings.API_PROFILING_HEADER):
+            return request.user.is_staff
+        rate = settings.API_PROFILING_SAMPLE_RATES.get(request.resolver_match.view_name)
+        return bool(rate) and random.random() < rate
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BudgetEntryArchive",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("count", models.PositiveIntegerField()),
+                ("income", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("expense", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("data", models.BinaryField()),
+                (
+                    "budget",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archives",
+                        to="api.budget",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="budgetentryarchive",
+            constraint=models.UniqueConstraint(
+                fields=("budget", "month"), name="unique_budget_archive_month"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_budgetentryarchive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(
+                fields=["budget", "created_at"], name="entry_budget_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(
+                fields=["budget", "type", "created_at"],
+                name="entry_budget_type_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(
+                fields=["budget", "value"], name="entry_budget_value_idx"
+            ),
+        ),
+    ]
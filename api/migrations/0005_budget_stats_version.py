@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_budgetentry_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budget",
+            name="stats_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
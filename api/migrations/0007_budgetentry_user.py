@@ -0,0 +1,96 @@
+# Generated by Django 3.2.9 on 2026-10-19 14:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_budget_user(apps, schema_editor):
+    Budget = apps.get_model("api", "Budget")
+    BudgetEntry = apps.get_model("api", "BudgetEntry")
+    BudgetEntry.objects.update(
+        user_id=Subquery(
+            Budget.objects.filter(pk=OuterRef("budget_id")).values("user_id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("api", "0006_job_heartbeat_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="budgetentry",
+            name="user",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(copy_budget_user, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="budgetentry",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="budgetentry",
+            name="entry_budget_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="budgetentry",
+            name="entry_budget_type_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="budgetentry",
+            name="entry_budget_value_idx",
+        ),
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(
+                fields=["user", "created_at"], name="entry_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(
+                fields=["user", "type", "created_at"],
+                name="entry_user_type_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(fields=["user", "value"], name="entry_user_value_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(
+                fields=["user", "budget", "created_at"],
+                name="entry_budget_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(
+                fields=["user", "budget", "type", "created_at"],
+                name="entry_budget_type_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="budgetentry",
+            index=models.Index(
+                fields=["user", "budget", "value"], name="entry_budget_value_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:50
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_budgetentry_user"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="budgetentryarchive",
+            name="count",
+        ),
+        migrations.RemoveField(
+            model_name="budgetentryarchive",
+            name="expense",
+        ),
+        migrations.RemoveField(
+            model_name="budgetentryarchive",
+            name="income",
+        ),
+    ]
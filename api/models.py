@@ -1,5 +1,11 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.dispatch import Signal
+
+# Sent by BudgetEntry.delete() with the deleted entry and its former pk.
+# Entries deliberately have no pre_delete/post_delete receivers, so deleting
+# a budget removes its entries with a single DELETE instead of loading them.
+entry_deleted = Signal()
 
 
 class TimestampAbstractModel(models.Model):
@@ -25,10 +31,23 @@ class Budget(TimestampAbstractModel):
         Category, related_name="category_budgets", on_delete=models.PROTECT
     )
     user = models.ForeignKey(User, related_name="budgets", on_delete=models.CASCADE)
+    # bumped with an UPDATE whenever the statistics of the budget change, it is
+    # part of their cache key, see api.stats_cache
+    stats_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # never write back a stale stats_version loaded with the instance
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "stats_version"
+            ]
+        super().save(*args, **kwargs)
+
 
 class BudgetEntry(TimestampAbstractModel):
     class Types(models.TextChoices):
@@ -39,6 +58,109 @@ class BudgetEntry(TimestampAbstractModel):
     value = models.DecimalField(max_digits=10, decimal_places=2)
     type = models.CharField(max_length=3, choices=Types.choices)
     budget = models.ForeignKey(Budget, related_name="entries", on_delete=models.CASCADE)
+    # copy of budget.user, so listing the entries of all budgets of a user is
+    # served by an index in the requested order, set by save()
+    user = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+
+    class Meta:
+        # backing the filters and orderings of the entry listing, which is
+        # always limited to the entries of the user, see
+        # api.filters.BudgetEntryFilter
+        indexes = [
+            models.Index(fields=("user", "created_at"), name="entry_user_created_idx"),
+            models.Index(
+                fields=("user", "type", "created_at"),
+                name="entry_user_type_created_idx",
+            ),
+            models.Index(fields=("user", "value"), name="entry_user_value_idx"),
+            models.Index(
+                fields=("user", "budget", "created_at"),
+                name="entry_budget_created_idx",
+            ),
+            models.Index(
+                fields=("user", "budget", "type", "created_at"),
+                name="entry_budget_type_created_idx",
+            ),
+            models.Index(
+                fields=("user", "budget", "value"), name="entry_budget_value_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the budget the entry is stored in, so moving the entry to another
+        # budget changes the statistics of both, see api.signals
+        instance.saved_budget_id = instance.__dict__.get("budget_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.user_id = self.budget.user_id
+        super().save(*args, **kwargs)
+        self.saved_budget_id = self.budget_id
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        entry_deleted.send(sender=BudgetEntry, instance=self, pk=pk)
+        return result
+
+
+class Job(TimestampAbstractModel):
+    class Kinds(models.TextChoices):
+        EXPORT = "EXP", "Export"
+        IMPORT = "IMP", "Import"
+        REPORT = "REP", "Report"
+
+    class Statuses(models.TextChoices):
+        PENDING = "PEN", "Pending"
+        RUNNING = "RUN", "Running"
+        DONE = "DON", "Done"
+        FAILED = "FAI", "Failed"
+
+    kind = models.CharField(max_length=3, choices=Kinds.choices)
+    status = models.CharField(
+        max_length=3, choices=Statuses.choices, default=Statuses.PENDING
+    )
+    progress = models.PositiveSmallIntegerField(default=0)
+    params = models.JSONField(default=dict, blank=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # refreshed by the worker while the job runs, see api.jobs.reclaim_jobs
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    user = models.ForeignKey(User, related_name="jobs", on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [models.Index(fields=("status", "created_at"))]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk}"
+
+
+class BudgetEntryArchive(models.Model):
+    """
+    Entries of a budget created in a single month, moved out of the
+    BudgetEntry table once they are old enough. The entries are kept as
+    zlib compressed JSON columns, see api.archive.
+    """
+
+    budget = models.ForeignKey(
+        Budget, related_name="archives", on_delete=models.CASCADE
+    )
+    month = models.DateField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("budget", "month"), name="unique_budget_archive_month"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.budget} {self.month:%Y-%m}"
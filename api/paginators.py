@@ -1,5 +1,10 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPaginator(PageNumberPagination):
     page_size = 10
+
+
+class CustomCursorPaginator(CursorPagination):
+    page_size = 10
+    ordering = "-created_at"
@@ -0,0 +1,156 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+PROFILE_LINES = 40
+
+
+class QueryRecorder:
+    def __init__(self, alias, queries):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "alias": self.alias,
+                    "sql": sql,
+                    "params": params if not many else None,
+                    "many": many,
+                    "duration_ms": (time.perf_counter() - start) * 1000,
+                }
+            )
+
+
+def profile_view(request, view_func, view_args, view_kwargs):
+    """
+    Call the view under cProfile while recording every SQL query, then write
+    a report to settings.API_PROFILING_DIR, also when the view raises.
+    Returns the response with the report id in the X-Profile-Report header.
+    """
+    queries = []
+    profiler = cProfile.Profile()
+    response = None
+    error = None
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(QueryRecorder(connection.alias, queries))
+                )
+            profiler.enable()
+            try:
+                response = view_func(request, *view_args, **view_kwargs)
+                # DRF responses are rendered lazily, include it in the profile
+                if hasattr(response, "render") and callable(response.render):
+                    response = response.render()
+            finally:
+                profiler.disable()
+    except BaseException as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        report_id = f"{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        write_report(
+            report_id,
+            build_report(
+                report_id,
+                request,
+                response,
+                error,
+                (time.perf_counter() - start) * 1000,
+                queries,
+                profiler,
+            ),
+        )
+    response["X-Profile-Report"] = report_id
+    return response
+
+
+def build_report(report_id, request, response, error, duration_ms, queries, profiler):
+    for query in queries:
+        if (
+            query["duration_ms"] >= settings.API_PROFILING_SLOW_QUERY_MS
+            and not query["many"]
+            and query["sql"].lstrip().upper().startswith("SELECT")
+        ):
+            query["explain"] = explain(query)
+        # parameters hold user data such as password hashes, they are only
+        # needed to explain the query and never written to the report
+        del query["params"]
+
+    stats = io.StringIO()
+    pstats.Stats(profiler, stream=stats).sort_stats("cumulative").print_stats(
+        PROFILE_LINES
+    )
+    return {
+        "id": report_id,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "view": request.resolver_match.view_name,
+        "user": str(request.user),
+        "status": response.status_code if response is not None else None,
+        "error": error,
+        "duration_ms": duration_ms,
+        "query_count": len(queries),
+        "query_duration_ms": sum(q["duration_ms"] for q in queries),
+        "queries": queries,
+        "profile": stats.getvalue(),
+    }
+
+
+def explain(query):
+    connection = connections[query["alias"]]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"{connection.ops.explain_query_prefix()} {query['sql']}",
+                query["params"],
+            )
+            return "\n".join(" ".join(str(c) for c in row) for row in cursor.fetchall())
+    except DatabaseError as exc:
+        # e.g. the transaction of a failed request is broken
+        return f"{type(exc).__name__}: {exc}"
+
+
+def write_report(report_id, report):
+    # reports show who requested what, keep them private to the server user
+    os.makedirs(settings.API_PROFILING_DIR, mode=0o700, exist_ok=True)
+    os.chmod(settings.API_PROFILING_DIR, 0o700)
+    path = os.path.join(settings.API_PROFILING_DIR, f"{report_id}.json")
+    with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+        json.dump(report, f, cls=DjangoJSONEncoder, indent=2)
+
+
+def list_reports():
+    if not os.path.isdir(settings.API_PROFILING_DIR):
+        return []
+    return sorted(
+        (
+            name[: -len(".json")]
+            for name in os.listdir(settings.API_PROFILING_DIR)
+            if name.endswith(".json")
+        ),
+        reverse=True,
+    )
+
+
+def read_report(report_id):
+    path = os.path.join(settings.API_PROFILING_DIR, f"{report_id}.json")
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from api.serializers import CreateUserSerializer
+from api.utils import process_pool
+
+BATCH_SIZE = 500
+
+
+def provision_users(rows, workers=None):
+    """
+    Create users from ``rows`` of CreateUserSerializer data. Invalid rows and
+    usernames which are taken or repeated in the batch are reported per row
+    index instead of failing the whole batch.
+
+    Returns a tuple of (created usernames, {row index: errors}).
+    """
+    errors = {}
+    passwords = {}
+    indexes = {}
+    for i, row in enumerate(rows):
+        serializer = CreateUserSerializer(data=row)
+        if not serializer.is_valid():
+            errors[i] = serializer.errors
+            continue
+        username = serializer.validated_data["username"]
+        if username in passwords:
+            errors[i] = {"username": ["Username is repeated in the batch."]}
+            continue
+        passwords[username] = serializer.validated_data["password1"]
+        indexes[username] = i
+
+    usernames = list(passwords)
+    for start in range(0, len(usernames), BATCH_SIZE):
+        for username in User.objects.filter(
+            username__in=usernames[start : start + BATCH_SIZE]
+        ).values_list("username", flat=True):
+            errors[indexes[username]] = {"username": ["Username is already taken."]}
+            del passwords[username]
+
+    hashes = hash_passwords(list(passwords.values()), workers)
+    users = [
+        User(username=username, password=password_hash)
+        for username, password_hash in zip(passwords, hashes)
+    ]
+    created = []
+    for start in range(0, len(users), BATCH_SIZE):
+        batch = users[start : start + BATCH_SIZE]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(batch)
+        except IntegrityError:
+            # a username was taken after it was checked above, insert the
+            # batch row by row to find out which
+            batch = _create_each(batch, indexes, errors)
+        created.extend(user.username for user in batch)
+    return created, dict(sorted(errors.items()))
+
+
+def _create_each(users, indexes, errors):
+    created = []
+    for user in users:
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            errors[indexes[user.username]] = {
+                "username": ["Username is already taken."]
+            }
+        else:
+            created.append(user)
+    return created
+
+
+def hash_passwords(passwords, workers=None):
+    # hashing is slow on purpose, so it is spread over all cores for batches
+    workers = min(workers or settings.PROVISIONING_WORKERS, len(passwords))
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    with process_pool(workers) as pool:
+        chunksize = max(len(passwords) // (workers * 4), 1)
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from api.models import Category, Budget, BudgetEntry
+from api.models import Category, Budget, BudgetEntry, Job
 
 
 class CreateUserSerializer(serializers.Serializer):
@@ -31,7 +31,8 @@ class BudgetEntrySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = BudgetEntry
-        fields = ("name", "type", "value", "id", "budget")
+        fields = ("name", "type", "value", "id", "budget", "created_at")
+        read_only_fields = ("created_at",)
 
 
 class BudgetSerializer(serializers.ModelSerializer):
@@ -58,3 +59,31 @@ class BudgetDetailSerializer(serializers.ModelSerializer):
 
     def get_category(self, obj):
         return obj.category.name
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = (
+            "id",
+            "kind",
+            "params",
+            "status",
+            "progress",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+        read_only_fields = (
+            "status",
+            "progress",
+            "error",
+            "started_at",
+            "finished_at",
+        )
+
+    def validate_params(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Params have to be an object.")
+        return value
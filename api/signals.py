@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.events import get_hub
+from api.models import Budget, BudgetEntry, Category, entry_deleted
+from api.serializers import BudgetEntrySerializer, BudgetSerializer, CategorySerializer
+from api.stats_cache import bump_stats_version
+
+EVENT_NAMES = {Category: "category", Budget: "budget", BudgetEntry: "entry"}
+EVENT_SERIALIZERS = {
+    Category: CategorySerializer,
+    Budget: BudgetSerializer,
+    BudgetEntry: BudgetEntrySerializer,
+}
+
+
+@receiver(post_save, sender=BudgetEntry)
+def entry_saved(sender, instance, created, **kwargs):
+    budget_ids = {instance.budget_id, getattr(instance, "saved_budget_id", None)}
+    bump_stats_version(Budget.objects.filter(pk__in=budget_ids - {None}))
+    publish_saved(instance, instance.budget.user_id, created)
+
+
+@receiver(entry_deleted, sender=BudgetEntry)
+def entry_removed(sender, instance, pk, **kwargs):
+    bump_stats_version(Budget.objects.filter(pk=instance.budget_id))
+    publish_deleted(instance, instance.budget.user_id, pk)
+
+
+@receiver(post_save, sender=Budget)
+def budget_saved(sender, instance, created, **kwargs):
+    if not created:
+        # the category, and with it the statistics, may have changed
+        bump_stats_version(Budget.objects.filter(pk=instance.pk))
+    publish_saved(instance, instance.user_id, created)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump_stats_version(Budget.objects.filter(category_id=instance.pk))
+    publish_saved(instance, instance.user_id, created)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Budget)
+def removed(sender, instance, **kwargs):
+    # entries deleted along with a budget are covered by budget.deleted
+    publish_deleted(instance, instance.user_id, instance.pk)
+
+
+def publish_saved(instance, user_id, created):
+    data = dict(EVENT_SERIALIZERS[type(instance)](instance).data)
+    data["id"] = instance.pk
+    publish(instance, user_id, "created" if created else "updated", data)
+
+
+def publish_deleted(instance, user_id, pk):
+    publish(instance, user_id, "deleted", {"id": pk})
+
+
+def publish(instance, user_id, action, data):
+    name = f"{EVENT_NAMES[type(instance)]}.{action}"
+    # serialized right away, published only once the change is committed
+    transaction.on_commit(lambda: get_hub().publish(user_id, name, data))
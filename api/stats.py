@@ -0,0 +1,159 @@
+import numpy as np
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from api.archive import unpack
+from api.models import BudgetEntry
+
+PERCENTILES = (25, 50, 75, 90)
+ROLLING_WINDOW = 3
+OUTLIER_Z_SCORE = 3.0
+
+
+def load_columns(queryset, archives=None):
+    """
+    Fetch the columns needed for statistics in a single query per table and
+    return them as NumPy arrays, one element per entry. Archived entries are
+    included when a BudgetEntryArchive queryset is given.
+    """
+    parts = []
+    rows = list(
+        queryset.annotate(
+            year=ExtractYear("created_at"), month=ExtractMonth("created_at")
+        ).values_list("id", "value", "type", "year", "month", "budget__category__name")
+    )
+    if rows:
+        ids, values, types, years, months, categories = zip(*rows)
+        parts.append(
+            {
+                "id": np.array(ids, dtype=np.int64),
+                "value": np.array(values, dtype=np.float64),
+                "type": np.array(types),
+                "month": np.array(years, dtype=np.int64) * 12
+                + np.array(months, dtype=np.int64)
+                - 1,
+                "category": np.array(categories),
+            }
+        )
+    if archives is not None:
+        for data, month, category in archives.values_list(
+            "data", "month", "budget__category__name"
+        ):
+            columns = unpack(data)
+            count = len(columns["id"])
+            parts.append(
+                {
+                    "id": np.array(columns["id"], dtype=np.int64),
+                    "value": np.array(columns["value"], dtype=np.float64),
+                    "type": np.array(columns["type"]),
+                    # every entry of an archive was created in the same month
+                    "month": np.full(count, month.year * 12 + month.month - 1),
+                    "category": np.full(count, category),
+                }
+            )
+    if not parts:
+        return None
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def compute_stats(queryset, archives=None):
+    return summarize(load_columns(queryset, archives))
+
+
+def summarize(columns):
+    if columns is None:
+        return {
+            "count": 0,
+            "income": 0.0,
+            "expense": 0.0,
+            "categories": {},
+            "months": [],
+            "outliers": [],
+        }
+    values = columns["value"]
+    is_expense = columns["type"] == BudgetEntry.Types.EXPENSE
+    income = np.where(is_expense, 0.0, values)
+    expense = np.where(is_expense, values, 0.0)
+    return {
+        "count": int(values.size),
+        "income": _round(income.sum()),
+        "expense": _round(expense.sum()),
+        "categories": _category_percentiles(values, columns["category"]),
+        "months": _monthly_series(columns["month"], income, expense),
+        "outliers": _outliers(columns["id"], values, is_expense),
+    }
+
+
+def _category_percentiles(values, categories):
+    names, inverse = np.unique(categories, return_inverse=True)
+    # sorting by (category, value) once lets every category be sliced out
+    # of a single array instead of masking the full column per category
+    order = np.lexsort((values, inverse))
+    sorted_values = values[order]
+    bounds = np.searchsorted(inverse[order], np.arange(names.size + 1))
+    result = {}
+    for i, name in enumerate(names):
+        group = sorted_values[bounds[i] : bounds[i + 1]]
+        percentiles = np.percentile(group, PERCENTILES)
+        result[str(name)] = {
+            "count": int(group.size),
+            "percentiles": {
+                f"p{p}": _round(v) for p, v in zip(PERCENTILES, percentiles)
+            },
+        }
+    return result
+
+
+def _monthly_series(months, income, expense):
+    first = months.min()
+    index = months - first
+    length = int(index.max()) + 1
+    monthly_income = np.bincount(index, weights=income, minlength=length)
+    monthly_expense = np.bincount(index, weights=expense, minlength=length)
+    net = monthly_income - monthly_expense
+
+    # trailing mean over up to ROLLING_WINDOW months using a cumulative sum
+    cumulative = np.concatenate(([0.0], np.cumsum(net)))
+    positions = np.arange(1, length + 1)
+    starts = np.maximum(positions - ROLLING_WINDOW, 0)
+    rolling = (cumulative[positions] - cumulative[starts]) / (positions - starts)
+    deltas = np.concatenate(([np.nan], np.diff(net)))
+
+    series = []
+    for i in range(length):
+        year, month = divmod(int(first) + i, 12)
+        series.append(
+            {
+                "month": f"{year:04d}-{month + 1:02d}",
+                "income": _round(monthly_income[i]),
+                "expense": _round(monthly_expense[i]),
+                "net": _round(net[i]),
+                "rolling_average": _round(rolling[i]),
+                "delta": None if np.isnan(deltas[i]) else _round(deltas[i]),
+            }
+        )
+    return series
+
+
+def _outliers(ids, values, is_expense):
+    # expenses and incomes are scored against their own distribution
+    group = is_expense.astype(np.int64)
+    counts = np.bincount(group, minlength=2)
+    sums = np.bincount(group, weights=values, minlength=2)
+    squares = np.bincount(group, weights=values * values, minlength=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares / counts - mean * mean, 0.0))
+        z_scores = (values - mean[group]) / std[group]
+    flagged = np.flatnonzero(np.abs(np.nan_to_num(z_scores)) >= OUTLIER_Z_SCORE)
+    return [
+        {
+            "id": int(ids[i]),
+            "value": _round(values[i]),
+            "z_score": _round(z_scores[i]),
+        }
+        for i in flagged
+    ]
+
+
+def _round(value):
+    return round(float(value), 2)
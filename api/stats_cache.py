@@ -0,0 +1,65 @@
+"""
+Caching of the statistics computed by api.stats. Kept apart from it, so the
+views and signal receivers using it do not import NumPy.
+"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import F
+
+from api.models import Budget, BudgetEntry, BudgetEntryArchive
+
+# keys of outdated versions are never read again, this only bounds how long
+# they take up memory
+STATS_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def budget_stats_cache_key(budget):
+    return f"stats:budget:{budget.pk}:{budget.stats_version}"
+
+
+def user_stats_cache_key(user):
+    # any change to a budget of the user, or to the set of budgets, gives a
+    # different key
+    versions = Budget.objects.filter(user_id=user.pk).order_by("pk")
+    digest = hashlib.md5(
+        repr(list(versions.values_list("pk", "stats_version"))).encode()
+    ).hexdigest()
+    return f"stats:user:{user.pk}:{digest}"
+
+
+def bump_stats_version(budgets):
+    """
+    Mark the statistics of the ``budgets`` queryset as changed. The version is
+    kept in the database, so every process sees the change.
+    """
+    budgets.update(stats_version=F("stats_version") + 1)
+
+
+def get_budget_stats(budget):
+    return _get_or_compute(
+        budget_stats_cache_key(budget),
+        BudgetEntry.objects.filter(budget_id=budget.pk),
+        BudgetEntryArchive.objects.filter(budget_id=budget.pk),
+    )
+
+
+def get_user_stats(user):
+    return _get_or_compute(
+        user_stats_cache_key(user),
+        BudgetEntry.objects.filter(user_id=user.pk),
+        BudgetEntryArchive.objects.filter(budget__user_id=user.pk),
+    )
+
+
+def _get_or_compute(key, queryset, archives):
+    stats = cache.get(key)
+    if stats is None:
+        # imported here, NumPy takes long to import and is only needed to
+        # compute statistics, not on worker start
+        from api.stats import compute_stats
+
+        stats = compute_stats(queryset, archives)
+        cache.set(key, stats, STATS_CACHE_TIMEOUT)
+    return stats
@@ -1,12 +1,34 @@
+import json
+import os
+import queue
 import random
 import string
-from unittest import TestCase
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import TestCase, mock, skipUnless
 
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
 from rest_framework.exceptions import ValidationError
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
+from api.archive import archive_entries, unpack
+from api.events import EventHub, LocalBackend, get_hub
 from api.factories import (
     BudgetFactory,
     UserFactory,
@@ -14,8 +36,22 @@ from api.factories import (
     BudgetEntryFactory,
 )
 from api.filters import CategoryFilter
-from api.models import Budget, BudgetEntry, Category
+from api.jobs import claim_jobs, reclaim_jobs, run_job
+from api.management.commands.import_times import parse_importtime
+from api.middleware import ConcurrencyLimitMiddleware
+from api.profiling import list_reports, profile_view, read_report
+from api.throttling import get_store, parse_rate
+from api.provisioning import provision_users
+from api.models import Budget, BudgetEntry, BudgetEntryArchive, Category, Job
 from api.serializers import CreateUserSerializer, CategorySerializer, BudgetSerializer
+from api.stats import compute_stats
+from api.stats_cache import bump_stats_version, get_budget_stats, get_user_stats
+from tivix.warmup import warm_up, warm_up_connections
+
+
+def claim_and_run(job):
+    claim_jobs(1, Job.objects.filter(pk=job.pk))
+    return run_job(job.pk)
 
 
 class APITests(TestCase):
@@ -23,6 +59,7 @@ class APITests(TestCase):
     def setUpClass(cls):
         cls.client = APIClient()
         cls.user = UserFactory.create()
+        get_store(settings.API_THROTTLE_DB).clear()
 
     def tearDown(self):
         self.client.logout()
@@ -220,6 +257,876 @@ class APITests(TestCase):
         self.assertEqual(r.status_code, 204)
         self.assertEqual(Category.objects.count(), count - 1)
 
+    def test_budget_stats_endpoint(self):
+        self.client.force_authenticate(self.user)
+        budget = BudgetFactory.create(user=self.user)
+        BudgetEntryFactory.create(budget=budget, type="EXP", value=100)
+        BudgetEntryFactory.create(budget=budget, type="INC", value=250)
+        r = self.client.get(reverse("api:budget-stats", kwargs={"pk": budget.pk}))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["count"], 2)
+        self.assertEqual(r.json()["income"], 250)
+        self.assertEqual(r.json()["expense"], 100)
+
+    def test_budget_stats_endpoint_unowned(self):
+        self.client.force_authenticate(self.user)
+        budget = BudgetFactory.create()
+        r = self.client.get(reverse("api:budget-stats", kwargs={"pk": budget.pk}))
+        self.assertEqual(r.status_code, 404)
+
+    def test_user_stats_endpoint(self):
+        user = UserFactory.create()
+        for i in range(2):
+            BudgetEntryFactory.create(budget=BudgetFactory.create(user=user))
+        BudgetEntryFactory.create()
+        self.client.force_authenticate(user)
+        r = self.client.get(reverse("api:budget-user-stats"))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["count"], 2)
+        self.assertEqual(len(r.json()["categories"]), 2)
+
+    def test_job_submit_and_poll(self):
+        self.client.force_authenticate(self.user)
+        data = {"kind": "REP", "params": {"year_from": 2020, "year_to": 2021}}
+        r = self.client.post(reverse("api:jobs-list"), data=data, format="json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json()["status"], Job.Statuses.PENDING)
+        r = self.client.get(reverse("api:jobs-detail", kwargs={"pk": r.json()["id"]}))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["progress"], 0)
+
+    def test_job_result_download(self):
+        self.client.force_authenticate(self.user)
+        job = Job.objects.create(user=self.user, kind=Job.Kinds.EXPORT)
+        url = reverse("api:jobs-result", kwargs={"pk": job.pk})
+        self.assertEqual(self.client.get(url).status_code, 409)
+        claim_and_run(job)
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("attachment", r["Content-Disposition"])
+
+    def test_job_unowned(self):
+        self.client.force_authenticate(self.user)
+        job = Job.objects.create(user=UserFactory.create(), kind=Job.Kinds.EXPORT)
+        r = self.client.get(reverse("api:jobs-detail", kwargs={"pk": job.pk}))
+        self.assertEqual(r.status_code, 404)
+
+
+class JobTests(TestCase):
+    def test_export_job(self):
+        entry = BudgetEntryFactory.create()
+        job = Job.objects.create(user=entry.budget.user, kind=Job.Kinds.EXPORT)
+        self.assertTrue(claim_and_run(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Statuses.DONE)
+        self.assertEqual(job.progress, 100)
+        result = json.loads(job.result)
+        self.assertEqual([e["id"] for e in result["entries"]], [entry.pk])
+        self.assertEqual(len(result["budgets"]), 1)
+
+    def test_import_job(self):
+        budget = BudgetFactory.create()
+        rows = [
+            {"name": "a", "type": "EXP", "value": "12.50"},
+            {"name": "b", "type": "XXX", "value": "1"},
+        ]
+        job = Job.objects.create(
+            user=budget.user,
+            kind=Job.Kinds.IMPORT,
+            params={"budget": budget.pk, "entries": rows},
+        )
+        self.assertTrue(claim_and_run(job))
+        job.refresh_from_db()
+        result = json.loads(job.result)
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(list(result["errors"]), ["1"])
+        self.assertEqual(budget.entries.count(), 1)
+
+    def test_import_job_unowned_budget(self):
+        job = Job.objects.create(
+            user=UserFactory.create(),
+            kind=Job.Kinds.IMPORT,
+            params={"budget": BudgetFactory.create().pk, "entries": []},
+        )
+        self.assertFalse(claim_and_run(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Statuses.FAILED)
+        self.assertTrue(job.error)
+
+    def test_report_job(self):
+        entry = BudgetEntryFactory.create()
+        year = entry.created_at.year
+        job = Job.objects.create(
+            user=entry.budget.user,
+            kind=Job.Kinds.REPORT,
+            params={"year_from": year - 1, "year_to": year},
+        )
+        claim_and_run(job)
+        job.refresh_from_db()
+        result = json.loads(job.result)
+        self.assertEqual(result[str(year - 1)]["count"], 0)
+        self.assertEqual(result[str(year)]["count"], 1)
+
+    def test_import_job_progress_outside_transaction(self):
+        budget = BudgetFactory.create()
+        rows = [{"name": "a", "type": "EXP", "value": "1"}] * 5
+        job = Job.objects.create(
+            user=budget.user,
+            kind=Job.Kinds.IMPORT,
+            params={"budget": budget.pk, "entries": rows},
+        )
+        in_transaction = []
+        with mock.patch("api.jobs.BATCH_SIZE", 2), mock.patch(
+            "api.jobs.set_progress",
+            side_effect=lambda *args: in_transaction.append(connection.in_atomic_block),
+        ):
+            self.assertTrue(claim_and_run(job))
+        self.assertEqual(in_transaction, [False, False])
+        self.assertEqual(budget.entries.count(), 5)
+
+    def test_report_job_years_capped(self):
+        job = Job.objects.create(
+            user=UserFactory.create(),
+            kind=Job.Kinds.REPORT,
+            params={"year_from": 1, "year_to": 9999},
+        )
+        self.assertFalse(claim_and_run(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Statuses.FAILED)
+        self.assertIn("at most", job.error)
+
+    def test_reclaim_stale_jobs(self):
+        user = UserFactory.create()
+        stale = Job.objects.create(user=user, kind=Job.Kinds.EXPORT)
+        alive = Job.objects.create(user=user, kind=Job.Kinds.EXPORT)
+        jobs = Job.objects.filter(pk__in=(stale.pk, alive.pk))
+        self.assertEqual(sorted(claim_jobs(2, jobs)), [stale.pk, alive.pk])
+        Job.objects.filter(pk=stale.pk).update(
+            heartbeat_at=datetime(2000, 1, 1, tzinfo=timezone.utc)
+        )
+        self.assertEqual(reclaim_jobs(jobs), [stale.pk])
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(stale.status, Job.Statuses.FAILED)
+        self.assertEqual(alive.status, Job.Statuses.RUNNING)
+        # a reclaimed job finishing late keeps its failed status
+        self.assertFalse(run_job(stale.pk))
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.Statuses.FAILED)
+        self.assertTrue(run_job(alive.pk))
+
+    def test_run_jobs_command(self):
+        job = Job.objects.create(user=UserFactory.create(), kind=Job.Kinds.EXPORT)
+        out = StringIO()
+        call_command(
+            "run_jobs",
+            "--once",
+            "--workers",
+            "1",
+            "--poll-interval",
+            "0.1",
+            "--job",
+            str(job.pk),
+            stdout=out,
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Statuses.DONE)
+        self.assertEqual(out.getvalue(), f"Job {job.pk} done.\n")
+
+
+class StatsTests(TestCase):
+    def test_empty_stats(self):
+        stats = compute_stats(BudgetEntry.objects.none())
+        self.assertEqual(stats["count"], 0)
+        self.assertEqual(stats["months"], [])
+
+    def test_monthly_series(self):
+        budget = BudgetFactory.create()
+        for month, value in ((1, 30), (1, 30), (2, 90), (4, 30)):
+            entry = BudgetEntryFactory.create(budget=budget, type="EXP", value=value)
+            BudgetEntry.objects.filter(pk=entry.pk).update(
+                created_at=datetime(2021, month, 15, tzinfo=timezone.utc)
+            )
+        months = compute_stats(budget.entries.all())["months"]
+        self.assertEqual(
+            [m["month"] for m in months], ["2021-01", "2021-02", "2021-03", "2021-04"]
+        )
+        self.assertEqual([m["net"] for m in months], [-60, -90, 0, -30])
+        self.assertEqual([m["rolling_average"] for m in months], [-60, -75, -50, -40])
+        self.assertEqual([m["delta"] for m in months], [None, -30, 90, -30])
+
+    def test_category_percentiles(self):
+        budget = BudgetFactory.create()
+        for value in range(1, 101):
+            BudgetEntryFactory.create(budget=budget, value=value)
+        stats = compute_stats(budget.entries.all())
+        percentiles = stats["categories"][budget.category.name]["percentiles"]
+        self.assertEqual(percentiles["p50"], 50.5)
+        self.assertEqual(percentiles["p90"], 90.1)
+
+    def test_outliers(self):
+        budget = BudgetFactory.create()
+        for i in range(20):
+            BudgetEntryFactory.create(budget=budget, type="EXP", value=10 + i % 2)
+        outlier = BudgetEntryFactory.create(budget=budget, type="EXP", value=1000)
+        BudgetEntryFactory.create(budget=budget, type="INC", value=1000)
+        stats = compute_stats(budget.entries.all())
+        self.assertEqual([o["id"] for o in stats["outliers"]], [outlier.pk])
+
+    def test_stats_invalidated_on_entry_change(self):
+        budget = BudgetFactory.create()
+        entry = BudgetEntryFactory.create(budget=budget, value=Decimal("10.50"))
+        budget.refresh_from_db()
+        self.assertEqual(get_budget_stats(budget)["count"], 1)
+        BudgetEntryFactory.create(budget=budget)
+        budget.refresh_from_db()
+        self.assertEqual(get_budget_stats(budget)["count"], 2)
+        self.assertEqual(get_user_stats(budget.user)["count"], 2)
+        entry.delete()
+        budget.refresh_from_db()
+        self.assertEqual(get_budget_stats(budget)["count"], 1)
+        self.assertEqual(get_user_stats(budget.user)["count"], 1)
+
+    def test_stats_invalidated_on_entry_move(self):
+        budget = BudgetFactory.create()
+        other = BudgetFactory.create(user=budget.user, category=budget.category)
+        entry = BudgetEntryFactory.create(budget=budget)
+        budget.refresh_from_db()
+        self.assertEqual(get_budget_stats(budget)["count"], 1)
+        self.assertEqual(get_budget_stats(other)["count"], 0)
+        client = APIClient()
+        client.force_authenticate(budget.user)
+        r = client.patch(
+            reverse("api:budget_entries-detail", kwargs={"pk": entry.pk}),
+            data={"budget": other.pk},
+        )
+        self.assertEqual(r.status_code, 200)
+        budget.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(get_budget_stats(budget)["count"], 0)
+        self.assertEqual(get_budget_stats(other)["count"], 1)
+
+    def test_stats_invalidated_by_other_process(self):
+        budget = BudgetFactory.create()
+        self.assertEqual(get_budget_stats(budget)["count"], 0)
+        # what a job worker does: no signals and no access to this cache
+        BudgetEntry.objects.bulk_create(
+            [BudgetEntryFactory.build(budget=budget, user_id=budget.user_id)]
+        )
+        bump_stats_version(Budget.objects.filter(pk=budget.pk))
+        budget.refresh_from_db()
+        self.assertEqual(get_budget_stats(budget)["count"], 1)
+
+    def test_budget_save_keeps_stats_version(self):
+        budget = BudgetFactory.create()
+        stale = Budget.objects.get(pk=budget.pk)
+        BudgetEntryFactory.create(budget=budget)
+        stale.name = "diffname"
+        stale.save()
+        budget.refresh_from_db()
+        self.assertEqual(budget.name, "diffname")
+        self.assertEqual(budget.stats_version, 2)
+
+    def test_budget_delete_does_not_load_entries(self):
+        budget = BudgetFactory.create()
+        for i in range(20):
+            BudgetEntryFactory.create(budget=budget)
+        with CaptureQueriesContext(connection) as queries:
+            budget.delete()
+        self.assertLess(len(queries), 10)
+        self.assertFalse(BudgetEntry.objects.filter(budget_id=budget.pk).exists())
+
+
+def create_entry(budget, created_at, **kwargs):
+    entry = BudgetEntryFactory.create(budget=budget, **kwargs)
+    BudgetEntry.objects.filter(pk=entry.pk).update(created_at=created_at)
+    return entry
+
+
+class BudgetEntryListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.user = UserFactory.create()
+        cls.budget = BudgetFactory.create(user=cls.user)
+        cls.entries = [
+            create_entry(
+                cls.budget,
+                datetime(2021, month, 1, tzinfo=timezone.utc),
+                name=f"entry {month}",
+                type="EXP" if month % 2 else "INC",
+                value=month * 10,
+            )
+            for month in range(1, 13)
+        ]
+        # entries of another user must never be listed
+        BudgetEntryFactory.create()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def list_ids(self, **params):
+        r = self.client.get(reverse("api:budget_entries-list"), params)
+        self.assertEqual(r.status_code, 200)
+        return [e["id"] for e in r.json()["results"]]
+
+    def test_list_newest_first(self):
+        ids = self.list_ids(budget=self.budget.pk)
+        self.assertEqual(ids, [e.pk for e in reversed(self.entries)][:10])
+
+    def test_list_only_own_entries(self):
+        other = BudgetFactory.create()
+        self.assertEqual(self.list_ids(budget=other.pk), [])
+
+    def test_list_filters(self):
+        self.assertEqual(
+            self.list_ids(
+                budget=self.budget.pk, type="INC", value_min=50, value_max=80
+            ),
+            # value ranges are ordered by value
+            [self.entries[5].pk, self.entries[7].pk],
+        )
+        self.assertEqual(
+            self.list_ids(
+                budget=self.budget.pk,
+                created_after="2021-03-01T00:00:00Z",
+                created_before="2021-05-01T00:00:00Z",
+            ),
+            [self.entries[3].pk, self.entries[2].pk],
+        )
+        self.assertEqual(
+            self.list_ids(budget=self.budget.pk, search="ENTRY 11"),
+            [self.entries[10].pk],
+        )
+
+    def test_orderings_without_index_rejected(self):
+        for params in (
+            {"value_min": 10, "ordering": "-created_at"},
+            {"created_after": "2021-01-01T00:00:00Z", "ordering": "value"},
+            {
+                "budget": self.budget.pk,
+                "created_before": "2021-01-01T00:00:00Z",
+                "ordering": "-value",
+            },
+            {"ordering": "value,created_at"},
+        ):
+            r = self.client.get(reverse("api:budget_entries-list"), params)
+            self.assertEqual(r.status_code, 400, params)
+            self.assertIn("ordering", r.json())
+        r = self.client.get(
+            reverse("api:budget_entries-list"),
+            {"value_min": 10, "created_after": "2021-01-01T00:00:00Z"},
+        )
+        self.assertEqual(r.status_code, 400)
+
+    def test_list_ordering_and_cursor(self):
+        url = reverse("api:budget_entries-list")
+        r = self.client.get(url, {"budget": self.budget.pk, "ordering": "value"})
+        ids = [e["id"] for e in r.json()["results"]]
+        r = self.client.get(r.json()["next"])
+        ids += [e["id"] for e in r.json()["results"]]
+        self.assertEqual(ids, [e.pk for e in self.entries])
+        self.assertIsNone(r.json()["next"])
+
+
+@skipUnless(connection.vendor == "sqlite", "query plans are checked on SQLite")
+class BudgetEntryQueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.budget = BudgetFactory.create()
+        cls.client = APIClient()
+        cls.client.force_authenticate(cls.budget.user)
+
+    def assertUsesIndex(self, index, **params):
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get(reverse("api:budget_entries-list"), params)
+        self.assertEqual(r.status_code, 200)
+        (sql,) = [q["sql"] for q in queries if "api_budgetentry" in q["sql"]]
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn(f"USING INDEX {index}", plan)
+        self.assertNotIn("SCAN api_budgetentry", plan)
+        self.assertNotIn("USE TEMP B-TREE", plan)
+
+    def test_all_budgets(self):
+        self.assertUsesIndex("entry_user_created_idx")
+
+    def test_type(self):
+        self.assertUsesIndex("entry_user_type_created_idx", type="EXP")
+
+    def test_created_range(self):
+        self.assertUsesIndex(
+            "entry_user_created_idx", created_after="2021-01-01T00:00:00Z"
+        )
+
+    def test_value_range(self):
+        self.assertUsesIndex("entry_user_value_idx", value_min=10, value_max=100)
+
+    def test_type_value_range(self):
+        self.assertUsesIndex("entry_user_value_idx", type="EXP", value_min=10)
+
+    def test_ordering_by_value(self):
+        self.assertUsesIndex("entry_user_value_idx", ordering="-value")
+
+    def test_created_range_ascending(self):
+        self.assertUsesIndex(
+            "entry_user_created_idx",
+            created_after="2021-01-01T00:00:00Z",
+            created_before="2022-01-01T00:00:00Z",
+            ordering="created_at",
+        )
+
+    def test_type_created_range(self):
+        self.assertUsesIndex(
+            "entry_user_type_created_idx",
+            type="INC",
+            created_before="2022-01-01T00:00:00Z",
+        )
+
+    def test_budget_type_created_range_search(self):
+        self.assertUsesIndex(
+            "entry_budget_type_created_idx",
+            budget=self.budget.pk,
+            type="INC",
+            created_after="2021-01-01T00:00:00Z",
+            search="test",
+        )
+
+    def test_budget_value_min_default_ordering(self):
+        self.assertUsesIndex(
+            "entry_budget_value_idx", budget=self.budget.pk, value_min=10
+        )
+
+    def test_budget(self):
+        self.assertUsesIndex("entry_budget_created_idx", budget=self.budget.pk)
+
+    def test_budget_search(self):
+        self.assertUsesIndex(
+            "entry_budget_created_idx", budget=self.budget.pk, search="test"
+        )
+
+    def test_budget_created_range(self):
+        self.assertUsesIndex(
+            "entry_budget_created_idx",
+            budget=self.budget.pk,
+            created_after="2021-01-01T00:00:00Z",
+            created_before="2022-01-01T00:00:00Z",
+        )
+
+    def test_budget_type(self):
+        self.assertUsesIndex(
+            "entry_budget_type_created_idx", budget=self.budget.pk, type="EXP"
+        )
+
+    def test_budget_value_range(self):
+        self.assertUsesIndex(
+            "entry_budget_value_idx",
+            budget=self.budget.pk,
+            value_min=10,
+            value_max=100,
+            ordering="value",
+        )
+
+    def test_budget_ordering_by_value(self):
+        self.assertUsesIndex(
+            "entry_budget_value_idx", budget=self.budget.pk, ordering="-value"
+        )
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.budget = BudgetFactory.create()
+        self.old = [
+            create_entry(self.budget, datetime(2020, 1, 5, tzinfo=timezone.utc)),
+            create_entry(self.budget, datetime(2020, 1, 20, tzinfo=timezone.utc)),
+            create_entry(self.budget, datetime(2020, 3, 1, tzinfo=timezone.utc)),
+        ]
+        self.recent = BudgetEntryFactory.create(budget=self.budget)
+
+    def archive(self, before):
+        # limited to the budget of the test, the database is not a test one
+        return archive_entries(before, Budget.objects.filter(pk=self.budget.pk))
+
+    def archived_ids(self):
+        return [
+            unpack(archive.data)["id"]
+            for archive in self.budget.archives.order_by("month")
+        ]
+
+    def test_archive_entries(self):
+        archived = self.archive(datetime(2021, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(archived, 3)
+        self.assertEqual(list(self.budget.entries.all()), [self.recent])
+        self.assertEqual(
+            self.archived_ids(),
+            [[self.old[0].pk, self.old[1].pk], [self.old[2].pk]],
+        )
+
+    def test_archive_deletes_read_entries_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.archive(datetime(2021, 1, 1, tzinfo=timezone.utc))
+        deletes = [
+            q["sql"]
+            for q in queries
+            if q["sql"].startswith('DELETE FROM "api_budgetentry"')
+        ]
+        self.assertEqual(len(deletes), 1)
+        for entry in self.old:
+            self.assertIn(str(entry.pk), deletes[0])
+
+    def test_archive_merges_existing_month(self):
+        self.assertEqual(self.archive(datetime(2020, 1, 10, tzinfo=timezone.utc)), 1)
+        self.assertEqual(self.archive(datetime(2021, 1, 1, tzinfo=timezone.utc)), 2)
+        self.assertEqual(
+            self.archived_ids(),
+            [[self.old[0].pk, self.old[1].pk], [self.old[2].pk]],
+        )
+
+    def test_stats_include_archived_entries(self):
+        before = compute_stats(self.budget.entries.all())
+        self.archive(datetime(2021, 1, 1, tzinfo=timezone.utc))
+        after = get_budget_stats(self.budget)
+        self.assertEqual(after["count"], 4)
+        self.assertEqual(after["months"], before["months"])
+        self.assertEqual(get_user_stats(self.budget.user)["expense"], before["expense"])
+
+    def test_budget_detail_include_archived(self):
+        self.archive(datetime(2021, 1, 1, tzinfo=timezone.utc))
+        url = reverse("api:budget-detail", kwargs={"pk": self.budget.pk})
+        r = APIClient().get(url)
+        self.assertEqual([e["id"] for e in r.json()["entries"]], [self.recent.pk])
+        r = APIClient().get(url, {"include_archived": "true"})
+        self.assertEqual(
+            [e["id"] for e in r.json()["entries"]],
+            [e.pk for e in self.old] + [self.recent.pk],
+        )
+        self.assertEqual(r.json()["entries"][0]["value"], f"{self.old[0].value:.2f}")
+
+    def test_archive_entries_command(self):
+        out = StringIO()
+        call_command(
+            "archive_entries",
+            "--days",
+            "365",
+            "--budget",
+            str(self.budget.pk),
+            stdout=out,
+        )
+        self.assertIn("Archived 3 entries", out.getvalue())
+        self.assertEqual(list(self.budget.entries.all()), [self.recent])
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        get_store(settings.API_THROTTLE_DB).clear()
+        self.client = APIClient()
+        self.user = UserFactory.create()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(API_THROTTLE_RATES={"user": {"write": "2/min"}})
+    def test_write_throttled_per_user(self):
+        url = reverse("api:category-list")
+        for i in range(2):
+            r = self.client.post(url, data={"name": "test"})
+            self.assertEqual(r.status_code, 201)
+        r = self.client.post(url, data={"name": "test"})
+        self.assertEqual(r.status_code, 429)
+        self.assertGreater(int(r["Retry-After"]), 0)
+        # other users have their own bucket
+        self.client.force_authenticate(UserFactory.create())
+        self.assertEqual(self.client.post(url, data={"name": "test"}).status_code, 201)
+
+    @override_settings(API_THROTTLE_RATES={"user": {"expensive": "1/min"}})
+    def test_expensive_scope_separate_from_cheap(self):
+        budget = BudgetFactory.create(user=self.user)
+        url = reverse("api:budget-stats", kwargs={"pk": budget.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 429)
+        self.assertEqual(self.client.get(reverse("api:budget-list")).status_code, 200)
+
+    @override_settings(API_THROTTLE_RATES={"ip": {"expensive": "1/min"}})
+    def test_anonymous_throttled_per_ip(self):
+        budget = BudgetFactory.create()
+        url = reverse("api:budget-detail", kwargs={"pk": budget.pk})
+        client = APIClient()
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(client.get(url).status_code, 429)
+        self.assertEqual(client.get(url, REMOTE_ADDR="10.0.0.1").status_code, 200)
+
+    @override_settings(API_THROTTLE_RATES={"ip": {"expensive": "1/min"}})
+    def test_forwarded_for_does_not_bypass_ip_throttle(self):
+        budget = BudgetFactory.create()
+        url = reverse("api:budget-detail", kwargs={"pk": budget.pk})
+        client = APIClient()
+        self.assertEqual(client.get(url).status_code, 200)
+        for address in ("10.0.0.2", "10.0.0.3, 10.0.0.4"):
+            r = client.get(url, HTTP_X_FORWARDED_FOR=address)
+            self.assertEqual(r.status_code, 429)
+
+    def test_bucket_store_concurrent_takes(self):
+        store = get_store(settings.API_THROTTLE_DB)
+        results = []
+
+        def take():
+            results.append(store.take("test:concurrent", 5, 5 / 3600, time.time()))
+
+        threads = [threading.Thread(target=take) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(None), 5)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("60/min"), (60, 60))
+        self.assertEqual(parse_rate("1/s"), (1, 1))
+        self.assertRaises(ImproperlyConfigured, parse_rate, "0/min")
+
+    @override_settings(API_MAX_CONCURRENT_REQUESTS=1)
+    def test_concurrency_limit(self):
+        middleware = ConcurrencyLimitMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get("/")
+        self.assertEqual(middleware(request).status_code, 200)
+        middleware.slots.acquire()
+        r = middleware(request)
+        self.assertEqual(r.status_code, 503)
+        self.assertIn("Retry-After", r)
+        middleware.slots.release()
+        self.assertEqual(middleware(request).status_code, 200)
+
+
+class StartupTests(TestCase):
+    def test_warm_up(self):
+        warm_up()
+        self.assertEqual(reverse("api:budget-list"), "/api/budget/")
+
+    def test_startup_does_not_import_numpy(self):
+        code = (
+            "import sys, django; django.setup(); "
+            "import api.views, api.signals; print('numpy' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_warm_up_persistent_connections_only(self):
+        connection.close()
+        warm_up_connections()
+        self.assertIsNone(connection.connection)
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=60):
+            warm_up_connections()
+            request_started.send(sender=self.__class__)
+            self.assertIsNotNone(connection.connection)
+        connection.close()
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   api.models\n"
+            "import time:      2000 |       5000 | api.views\n"
+        )
+        self.assertEqual(
+            parse_importtime(output),
+            {"api.models": (120, 120), "api.views": (2000, 5000)},
+        )
+
+
+class EventTests(TestCase):
+    def setUp(self):
+        self.backend = LocalBackend()
+        self.hub = EventHub(self.backend, history=3, queue_size=2)
+
+    def event_id(self, sequence):
+        return f"{self.backend.epoch}-{sequence}"
+
+    def test_publish_to_user_subscriptions(self):
+        subscription = self.hub.subscribe(1)
+        other = self.hub.subscribe(2)
+        self.hub.publish(1, "budget.created", {"id": 5})
+        event = subscription.get(timeout=0)
+        self.assertEqual(
+            (event.id, event.name, event.data),
+            (self.event_id(1), "budget.created", {"id": 5}),
+        )
+        self.assertRaises(queue.Empty, other.get, timeout=0)
+
+    def test_resume_from_last_event_id(self):
+        for i in range(3):
+            self.hub.publish(1, "entry.created", {"id": i})
+        subscription = self.hub.subscribe(1, last_event_id=self.event_id(1))
+        self.assertEqual(
+            [subscription.get(0).id for i in range(2)],
+            [self.event_id(2), self.event_id(3)],
+        )
+        subscription = self.hub.subscribe(1, last_event_id=self.event_id(3))
+        self.assertRaises(queue.Empty, subscription.get, timeout=0)
+        # history only keeps the last 3 events
+        self.hub.publish(1, "entry.created", {"id": 3})
+        subscription = self.hub.subscribe(1, last_event_id=self.event_id(0))
+        self.assertEqual(subscription.get(0).name, "reset")
+
+    def test_resume_after_restart_is_reset(self):
+        for i in range(3):
+            self.hub.publish(1, "entry.created", {"id": i})
+        # ids seen before a restart, from a newer process or malformed
+        for last_event_id in (
+            "0123456789ab-2",
+            self.event_id(7),
+            "2",
+            "garbage",
+        ):
+            subscription = self.hub.subscribe(1, last_event_id=last_event_id)
+            self.assertEqual(subscription.get(0).name, "reset")
+        # nothing published to the user since the restart
+        subscription = self.hub.subscribe(2, last_event_id="0123456789ab-2")
+        self.assertEqual(subscription.get(0).name, "reset")
+
+    def test_history_of_idle_users_is_forgotten(self):
+        hub = EventHub(self.backend, history=3, queue_size=2, users=2)
+        subscription = hub.subscribe(5)
+        hub.unsubscribe(subscription)
+        self.assertEqual((hub.history, hub.subscriptions), ({}, {}))
+        for user_id in (1, 2, 1, 3):
+            hub.publish(user_id, "entry.created", {})
+        self.assertEqual(list(hub.history), [1, 3])
+        # user 2's events are gone, a client that saw some has to reset
+        subscription = hub.subscribe(2, last_event_id=self.event_id(2))
+        self.assertEqual(subscription.get(0).name, "reset")
+        # events of other users in between do not make user 1's history stale
+        subscription = hub.subscribe(1, last_event_id=self.event_id(1))
+        self.assertEqual(subscription.get(0).id, self.event_id(3))
+        subscription = hub.subscribe(3, last_event_id=self.event_id(3))
+        self.assertEqual(subscription.get(0).id, self.event_id(4))
+
+    def test_slow_subscription_is_reset(self):
+        subscription = self.hub.subscribe(1)
+        for i in range(3):
+            self.hub.publish(1, "entry.created", {"id": i})
+        self.assertEqual(subscription.get(0).name, "reset")
+        self.assertRaises(queue.Empty, subscription.get, timeout=0)
+
+    def test_event_stream_endpoint(self):
+        user = UserFactory.create()
+        client = APIClient()
+        self.assertEqual(client.get(reverse("api:events")).status_code, 403)
+        client.force_authenticate(user)
+        r = client.get(reverse("api:events"), HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(r["Content-Type"], "text/event-stream")
+        content = iter(r.streaming_content)
+        self.assertTrue(next(content).startswith(b"retry:"))
+        category = CategoryFactory.create(user=user)
+        message = next(content).decode()
+        self.assertIn("event: category.created", message)
+        self.assertIn(f'"id": {category.pk}', message)
+        r.close()
+        # a reconnecting client gets the events it has missed
+        last_event_id = message.split("\n")[0][len("id: ") :]
+        category.delete()
+        r = client.get(reverse("api:events"), HTTP_LAST_EVENT_ID=last_event_id)
+        content = iter(r.streaming_content)
+        next(content)
+        self.assertIn("event: category.deleted", next(content).decode())
+        r.close()
+        self.assertNotIn(user.pk, get_hub().subscriptions)
+        # responses closed before they are read do not subscribe at all
+        r = client.head(reverse("api:events"))
+        self.assertEqual(r.status_code, 200)
+        r.close()
+        client.get(reverse("api:events")).close()
+        self.assertNotIn(user.pk, get_hub().subscriptions)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.settings = override_settings(
+            API_PROFILING_ENABLED=True,
+            API_PROFILING_DIR=tempfile.mkdtemp(),
+            API_PROFILING_SLOW_QUERY_MS=0,
+            API_PROFILING_SAMPLE_RATES={"api:category-list": 1.0},
+        )
+        self.settings.enable()
+        self.staff = UserFactory.create(is_staff=True)
+        BudgetEntryFactory.create(budget=BudgetFactory.create(user=self.staff))
+
+    def tearDown(self):
+        self.settings.disable()
+
+    def test_profile_with_header(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        r = client.get(reverse("api:budget-list"), HTTP_X_PROFILE="1")
+        self.assertEqual(r.status_code, 200)
+        report = read_report(r["X-Profile-Report"])
+        self.assertEqual(report["view"], "api:budget-list")
+        self.assertGreater(report["query_count"], 0)
+        self.assertIn("SEARCH", report["queries"][-1]["explain"])
+        self.assertIn("function calls", report["profile"])
+
+    def test_header_ignored_for_non_staff(self):
+        client = APIClient()
+        client.force_login(UserFactory.create())
+        r = client.get(reverse("api:budget-list"), HTTP_X_PROFILE="1")
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn("X-Profile-Report", r)
+
+    def test_sampled_route(self):
+        client = APIClient()
+        client.force_login(UserFactory.create())
+        r = client.get(reverse("api:category-list"))
+        self.assertIn("X-Profile-Report", r)
+
+    def test_report_written_when_view_raises(self):
+        request = RequestFactory().get("/api/budget/")
+        request.user = self.staff
+        request.resolver_match = resolve("/api/budget/")
+
+        def view(request):
+            list(Budget.objects.all()[:1])
+            raise ValueError("broken")
+
+        with self.assertRaises(ValueError):
+            profile_view(request, view, (), {})
+        (report_id,) = list_reports()
+        report = read_report(report_id)
+        self.assertEqual(report["error"], "ValueError: broken")
+        self.assertIsNone(report["status"])
+        self.assertEqual(report["query_count"], 1)
+
+    def test_report_private_without_params(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        data = {
+            "username": random_username(),
+            "password1": "password123456789",
+            "password2": "password123456789",
+        }
+        r = client.post(reverse("api:create_user"), data, HTTP_X_PROFILE="1")
+        self.assertEqual(r.status_code, 201)
+        path = os.path.join(settings.API_PROFILING_DIR, f"{r['X-Profile-Report']}.json")
+        with open(path) as f:
+            content = f.read()
+        # the view stores the password as given
+        self.assertNotIn("password123456789", content)
+        self.assertNotIn('"params"', content)
+        self.assertEqual(os.stat(settings.API_PROFILING_DIR).st_mode & 0o777, 0o700)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+    def test_report_admin_views(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        report_id = client.get(reverse("api:budget-list"), HTTP_X_PROFILE="1")[
+            "X-Profile-Report"
+        ]
+        r = client.get(reverse("profile_report_list"))
+        self.assertIn(report_id, r.content.decode())
+        r = client.get(reverse("profile_report_detail", args=(report_id,)))
+        self.assertIn("SQL queries:", r.content.decode())
+        client.force_login(UserFactory.create())
+        r = client.get(reverse("profile_report_detail", args=(report_id,)))
+        self.assertEqual(r.status_code, 302)
+
 
 class FilterTests(TestCase):
     def test_category_filter(self):
@@ -234,6 +1141,90 @@ class FilterTests(TestCase):
         self.assertEqual(filter_obj.qs.count(), expected_count)
 
 
+def random_username():
+    return "".join(random.choice(string.ascii_letters) for i in range(15))
+
+
+class ProvisioningTests(TestCase):
+    def user_data(self, username=None, password="password123456789"):
+        return {
+            "username": username or random_username(),
+            "password1": password,
+            "password2": password,
+        }
+
+    def test_provision_users(self):
+        existing = UserFactory.create()
+        rows = [
+            self.user_data(),
+            self.user_data(existing.username),
+            self.user_data(password="short"),
+            self.user_data(),
+        ]
+        rows.append(self.user_data(rows[0]["username"]))
+        created, errors = provision_users(rows, workers=1)
+        self.assertEqual(created, [rows[0]["username"], rows[3]["username"]])
+        self.assertEqual(list(errors), [1, 2, 4])
+        user = User.objects.get(username=rows[0]["username"])
+        self.assertTrue(user.check_password("password123456789"))
+
+    def test_provision_users_process_pool(self):
+        rows = [self.user_data() for i in range(3)]
+        created, errors = provision_users(rows, workers=2)
+        self.assertEqual(len(created), 3)
+        self.assertEqual(errors, {})
+        for row in rows:
+            user = User.objects.get(username=row["username"])
+            self.assertTrue(user.check_password(row["password1"]))
+
+    def test_provision_users_username_taken_meanwhile(self):
+        rows = [self.user_data() for i in range(3)]
+
+        def hash_and_race(passwords, workers):
+            # another request creates one of the users after the check
+            UserFactory.create(username=rows[1]["username"])
+            return [f"hash{i}" for i in range(len(passwords))]
+
+        with mock.patch("api.provisioning.hash_passwords", hash_and_race):
+            created, errors = provision_users(rows, workers=1)
+        self.assertEqual(created, [rows[0]["username"], rows[2]["username"]])
+        self.assertEqual(list(errors), [1])
+        self.assertTrue(User.objects.filter(username=rows[2]["username"]).exists())
+
+    @override_settings(PROVISIONING_MAX_REQUEST_ROWS=1)
+    def test_bulk_create_user_endpoint_limit(self):
+        client = APIClient()
+        client.force_authenticate(UserFactory.create(is_staff=True))
+        rows = [self.user_data(), self.user_data()]
+        r = client.post(reverse("api:bulk_create_user"), rows, format="json")
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(User.objects.filter(username=rows[0]["username"]).exists())
+
+    def test_bulk_create_user_endpoint(self):
+        client = APIClient()
+        url = reverse("api:bulk_create_user")
+        rows = [self.user_data(), self.user_data(password="short")]
+        client.force_authenticate(UserFactory.create())
+        self.assertEqual(client.post(url, rows, format="json").status_code, 403)
+        client.force_authenticate(UserFactory.create(is_staff=True))
+        r = client.post(url, rows, format="json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json()["created"], [rows[0]["username"]])
+        self.assertEqual(list(r.json()["errors"]), ["1"])
+
+    def test_provision_users_command(self):
+        rows = [self.user_data(), self.user_data(password="short")]
+        path = os.path.join(tempfile.mkdtemp(), "users.json")
+        with open(path, "w") as f:
+            json.dump(rows, f)
+        out = StringIO()
+        call_command(
+            "provision_users", path, "--workers", "1", stdout=out, stderr=StringIO()
+        )
+        self.assertIn("Created 1 users, 1 rows failed.", out.getvalue())
+        self.assertTrue(User.objects.filter(username=rows[0]["username"]).exists())
+
+
 class SerializerTests(TestCase):
     def test_user_serializer_different_passwords(self):
         data = {
@@ -0,0 +1,161 @@
+import functools
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a rate such as "60/min" into (capacity, period in seconds).
+    """
+    num, period = rate.split("/")
+    if int(num) < 1:
+        # a bucket without capacity is never refilled, leave the scope out
+        # of API_THROTTLE_RATES to not throttle it
+        raise ImproperlyConfigured(f"Throttle rate {rate!r} allows no requests.")
+    return int(num), PERIODS[period[0]]
+
+
+def check_throttle_rates():
+    for rates in settings.API_THROTTLE_RATES.values():
+        for rate in rates.values():
+            parse_rate(rate)
+
+
+class BucketStore:
+    """
+    Token buckets in a SQLite file, shared by all workers of a host. Every
+    update takes the database write lock before reading the bucket, so
+    concurrent requests cannot spend the same token, and touches a single row
+    looked up by its primary key.
+    """
+
+    # full buckets are removed once every PRUNE_EVERY updates of a connection
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            # autocommit mode, transactions are started explicitly in take()
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bucket ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                "updated_at REAL NOT NULL, full_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self.local.connection = connection
+            self.local.updates = 0
+        return connection
+
+    def take(self, key, capacity, refill, now):
+        """
+        Take a token from the bucket ``key``. Returns None on success,
+        otherwise the seconds until the next token is available.
+        """
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated_at FROM bucket WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated_at = row or (capacity, now)
+            tokens = min(capacity, tokens + max(now - updated_at, 0) * refill)
+            if tokens < 1:
+                wait = (1 - tokens) / refill
+            else:
+                wait = None
+                tokens -= 1
+                connection.execute(
+                    "INSERT OR REPLACE INTO bucket VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, now + (capacity - tokens) / refill),
+                )
+                self.local.updates += 1
+                if self.local.updates % self.PRUNE_EVERY == 0:
+                    connection.execute("DELETE FROM bucket WHERE full_at < ?", (now,))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return wait
+
+    def clear(self):
+        self.connect().execute("DELETE FROM bucket")
+
+
+@functools.lru_cache(maxsize=None)
+def get_store(path):
+    return BucketStore(path)
+
+
+def get_throttle_scope(request, view):
+    if request.method not in SAFE_METHODS:
+        return "write"
+    if getattr(view, "action", None) in getattr(view, "expensive_actions", ()):
+        return "expensive"
+    return "cheap"
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per client and scope, kept in the BucketStore at
+    settings.API_THROTTLE_DB so all workers of a host share it. A bucket
+    holds up to ``capacity`` tokens and is refilled continuously at
+    ``capacity`` tokens per ``period``, so short bursts are allowed while the
+    sustained rate stays capped.
+
+    Rates are configured in settings.API_THROTTLE_RATES under ``rates_key``;
+    scopes without a rate are not throttled.
+    """
+
+    rates_key = None
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_ident_key(self, request):
+        raise NotImplementedError(".get_ident_key() must be overridden.")
+
+    def allow_request(self, request, view):
+        scope = get_throttle_scope(request, view)
+        rate = settings.API_THROTTLE_RATES.get(self.rates_key, {}).get(scope)
+        ident = self.get_ident_key(request)
+        if rate is None or ident is None:
+            return True
+        capacity, period = parse_rate(rate)
+        key = f"{self.rates_key}:{scope}:{ident}"
+        store = get_store(settings.API_THROTTLE_DB)
+        self.retry_after = store.take(key, capacity, capacity / period, time.time())
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    rates_key = "user"
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    rates_key = "ip"
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
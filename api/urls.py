@@ -24,12 +24,24 @@ budget_entries_router.register(
     basename="budget_entries",
 )
 
+jobs_router = SimpleRouter()
+jobs_router.register(
+    r"jobs",
+    views.JobViewSet,
+    basename="jobs",
+)
+
 app_name = "api"
 urlpatterns = (
     [
         path("user/", views.CreateUserAPIView.as_view(), name="create_user"),
+        path(
+            "user/bulk/", views.BulkCreateUserAPIView.as_view(), name="bulk_create_user"
+        ),
+        path("events/", views.EventStreamAPIView.as_view(), name="events"),
     ]
     + category_router.urls
     + budget_router.urls
     + budget_entries_router.urls
+    + jobs_router.urls
 )
@@ -0,0 +1,14 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+
+def process_pool(workers):
+    # workers are spawned rather than forked so they never share the parent's
+    # database connections, and set Django up on their own
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
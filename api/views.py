@@ -1,21 +1,30 @@
 from django.contrib.auth.models import User
 from django.db import IntegrityError
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, viewsets, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from api.filters import CategoryFilter
-from api.models import Category, Budget, BudgetEntry
-from api.paginators import CustomPaginator
+from api.archive import archived_entries
+from api.events import EventStreamRenderer, get_hub, stream
+from api.filters import BudgetEntryFilter, CategoryFilter, KeysetOrderingFilter
+from api.models import Category, Budget, BudgetEntry, Job
+from api.paginators import CustomCursorPaginator, CustomPaginator
 from api.serializers import (
     CreateUserSerializer,
     CategorySerializer,
     BudgetSerializer,
     BudgetEntrySerializer,
     BudgetDetailSerializer,
+    JobSerializer,
 )
+from api.provisioning import provision_users
+from api.stats_cache import get_budget_stats, get_user_stats
 
 
 class CustomCreateMixin:
@@ -56,6 +65,29 @@ class CreateUserAPIView(APIView):
         return Response({"User created"}, status=status.HTTP_201_CREATED)
 
 
+class BulkCreateUserAPIView(APIView):
+
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return Response(
+                "Expected a list of users.", status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > settings.PROVISIONING_MAX_REQUEST_ROWS:
+            return Response(
+                f"At most {settings.PROVISIONING_MAX_REQUEST_ROWS} users can be "
+                "created per request, use the provision_users command for more.",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # hashed in the request's own thread, starting worker processes for
+        # a request this small costs more than it saves
+        created, errors = provision_users(request.data, workers=1)
+        return Response(
+            {"created": created, "errors": errors}, status=status.HTTP_201_CREATED
+        )
+
+
 class CategoryViewset(
     CustomCreateMixin,
     viewsets.ModelViewSet,
@@ -72,6 +104,7 @@ class CategoryViewset(
 class BudgetViewSet(CustomCreateMixin, viewsets.ModelViewSet):
 
     model_class = Budget
+    expensive_actions = ("retrieve", "stats", "user_stats")
     permission_classes = (IsAuthenticated,)
     pagination_class = CustomPaginator
     filterset_class = CategoryFilter
@@ -92,9 +125,28 @@ class BudgetViewSet(CustomCreateMixin, viewsets.ModelViewSet):
             return []
         return super().get_permissions()
 
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        data = self.get_serializer(instance).data
+        if request.query_params.get("include_archived") in ("1", "true"):
+            archived = archived_entries(instance.archives.all())
+            data["entries"] = (
+                BudgetEntrySerializer(archived, many=True).data + data["entries"]
+            )
+        return Response(data)
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        return Response(get_budget_stats(self.get_object()))
+
+    @action(detail=False, url_path="stats")
+    def user_stats(self, request):
+        return Response(get_user_stats(request.user))
+
 
 class BudgetEntryViewSet(
     mixins.CreateModelMixin,
+    mixins.ListModelMixin,
     mixins.UpdateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.DestroyModelMixin,
@@ -104,9 +156,68 @@ class BudgetEntryViewSet(
     model_class = BudgetEntry
     serializer_class = BudgetEntrySerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = CustomCursorPaginator
+    filterset_class = BudgetEntryFilter
+    filter_backends = (DjangoFilterBackend, KeysetOrderingFilter)
+    ordering_fields = ("created_at", "value")
+    ordering = ("-created_at",)
+    range_filter_orderings = {
+        "value_min": "value",
+        "value_max": "value",
+        "created_after": "created_at",
+        "created_before": "created_at",
+    }
+
+    def get_queryset(self):
+        return BudgetEntry.objects.filter(user_id=self.request.user.pk).order_by("name")
+
+
+class JobViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
     pagination_class = CustomPaginator
 
     def get_queryset(self):
-        return BudgetEntry.objects.filter(
-            budget__in=self.request.user.budgets.all()
-        ).order_by("name")
+        return Job.objects.filter(user_id=self.request.user.pk).order_by("-created_at")
+
+    def perform_create(self, serializer):
+        serializer.save(user_id=self.request.user.pk)
+
+    @action(detail=True)
+    def result(self, request, pk=None):
+        job = self.get_object()
+        if job.status != Job.Statuses.DONE:
+            return Response(
+                "Job has not finished yet.", status=status.HTTP_409_CONFLICT
+            )
+        response = HttpResponse(job.result, content_type="application/json")
+        filename = f"{job.get_kind_display().lower()}-{job.pk}.json"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class EventStreamAPIView(APIView):
+
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (JSONRenderer, EventStreamRenderer)
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            stream(
+                get_hub(),
+                request.user.pk,
+                request.META.get("HTTP_LAST_EVENT_ID") or None,
+                settings.API_EVENTS_HEARTBEAT,
+            ),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # keeps proxies such as nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 
@@ -31,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.ConcurrencyLimitMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -38,6 +40,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "tivix.urls"
@@ -72,6 +75,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+
+# Processes hashing passwords of users created in bulk, see api.provisioning
+
+PROVISIONING_WORKERS = int(os.getenv("PROVISIONING_WORKERS", os.cpu_count() or 1))
+
+# Users created per request of the bulk endpoint, larger batches go through
+# the provision_users management command
+
+PROVISIONING_MAX_REQUEST_ROWS = 50
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -109,3 +132,67 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = "/static/"
+
+# Budget entries older than this are moved to the archive by the
+# archive_entries management command
+
+ENTRY_ARCHIVE_AFTER_DAYS = int(os.getenv("ENTRY_ARCHIVE_AFTER_DAYS", 365))
+
+# Running jobs without a heartbeat for this many seconds are considered to be
+# abandoned by a run_jobs process that stopped and are marked as failed, see
+# api.jobs
+
+JOB_HEARTBEAT_TIMEOUT = int(os.getenv("JOB_HEARTBEAT_TIMEOUT", 10 * 60))
+
+# NUM_PROXIES is the number of reverse proxies in front of the application.
+# Clients are identified by the address the last of them has seen, 0 uses
+# REMOTE_ADDR and ignores X-Forwarded-For, which clients can set at will.
+
+REST_FRAMEWORK = {
+    "DEFAULT_THROTTLE_CLASSES": (
+        "api.throttling.UserTokenBucketThrottle",
+        "api.throttling.IPTokenBucketThrottle",
+    ),
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 0)),
+}
+
+# Token bucket rates per scope, see api.throttling. Per IP rates are higher as
+# several users may share an address. The buckets are kept in a SQLite file so
+# they are shared by all workers on the host.
+
+API_THROTTLE_DB = os.getenv(
+    "API_THROTTLE_DB", os.path.join(tempfile.gettempdir(), "tivix_throttle.sqlite3")
+)
+
+API_THROTTLE_RATES = {
+    "user": {"cheap": "600/min", "expensive": "60/min", "write": "120/min"},
+    "ip": {"cheap": "1200/min", "expensive": "120/min", "write": "240/min"},
+}
+
+# Requests served concurrently by a single process before new ones are
+# rejected with 503, 0 disables the limit
+
+API_MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENT_REQUESTS", 64))
+API_OVERLOAD_RETRY_AFTER = 1
+
+# Server-sent events of budget changes, see api.events. The backend delivers
+# events between processes, LocalBackend only within the current one.
+
+API_EVENTS_BACKEND = os.getenv("API_EVENTS_BACKEND", "api.events.LocalBackend")
+API_EVENTS_HISTORY = 1000
+API_EVENTS_QUEUE_SIZE = 100
+# history is kept for the users with the most recent events only
+API_EVENTS_USERS = 1000
+API_EVENTS_HEARTBEAT = 15
+API_EVENTS_RETRY_MS = 3000
+
+# On-demand profiling, see api.middleware.ProfilingMiddleware. Sample rates
+# are given per URL name, e.g. {"api:budget-detail": 0.01}.
+
+API_PROFILING_ENABLED = bool(os.getenv("API_PROFILING_ENABLED"))
+API_PROFILING_HEADER = "HTTP_X_PROFILE"
+API_PROFILING_SAMPLE_RATES = {}
+API_PROFILING_SLOW_QUERY_MS = 100
+API_PROFILING_DIR = os.getenv(
+    "API_PROFILING_DIR", os.path.join(tempfile.gettempdir(), "tivix_profiles")
+)
@@ -0,0 +1,50 @@
+"""
+API-only settings for tivix project.
+
+Same as tivix.settings without the admin, browsable API, templates, static
+files and messages, which the API does not use but every worker would load
+on start. Enable with DJANGO_SETTINGS_MODULE=tivix.settings_api.
+"""
+
+import os
+
+from tivix.settings import *  # noqa: F401,F403
+from tivix.settings import DATABASES, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "rest_framework",
+    "api",
+    "django_filters",
+]
+
+MIDDLEWARE = [
+    "api.middleware.ConcurrencyLimitMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.middleware.ProfilingMiddleware",
+]
+
+ROOT_URLCONF = "tivix.urls_api"
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+}
+
+# Persistent connections, without them the connections opened by the
+# DJANGO_WARMUP warm-up are closed when the first request starts
+
+DATABASES = {
+    **DATABASES,
+    "default": {
+        **DATABASES["default"],
+        "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", 60)),
+    },
+}
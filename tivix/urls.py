@@ -1,7 +1,15 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from api.admin import profile_report_detail, profile_report_list
+
 urlpatterns = [
+    path("admin/profiles/", profile_report_list, name="profile_report_list"),
+    path(
+        "admin/profiles/<slug:report_id>/",
+        profile_report_detail,
+        name="profile_report_detail",
+    ),
     path("admin/", admin.site.urls),
     path("auth/", include("rest_framework.urls")),
     path("api/", include("api.urls")),
@@ -0,0 +1,44 @@
+"""
+Warm-up of a freshly started worker, so the first request does not pay for
+work Django and DRF otherwise do lazily.
+
+Call it in the worker process itself (it is run from tivix.wsgi when
+DJANGO_WARMUP is set), never in a parent that forks workers afterwards, as
+the opened database connections must not be shared between processes.
+"""
+
+from django.apps import apps
+from django.db import connections
+from django.urls import get_resolver
+
+
+def warm_up():
+    warm_up_urls()
+    warm_up_serializers()
+    warm_up_connections()
+
+
+def warm_up_urls():
+    # imports every urlconf and view module and builds the lookup tables
+    # used by resolve() and reverse()
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for _, namespace_resolver in resolver.namespace_dict.values():
+        namespace_resolver.reverse_dict
+
+
+def warm_up_serializers():
+    # builds the cached model metadata ModelSerializer introspects to map
+    # model fields to serializer fields; the field maps themselves are built
+    # per serializer instance, so there is nothing to reuse across requests
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def warm_up_connections():
+    # Django closes connections with CONN_MAX_AGE = 0 (the default) when the
+    # first request starts, so only persistent ones are worth opening. They
+    # are reused by requests served on this thread, i.e. by sync workers.
+    for connection in connections.all():
+        if connection.settings_dict["CONN_MAX_AGE"] != 0:
+            connection.ensure_connection()
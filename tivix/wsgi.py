@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tivix.settings")
 
 application = get_wsgi_application()
+
+if os.getenv("DJANGO_WARMUP"):
+    from tivix.warmup import warm_up
+
+    warm_up()